@@ -4,9 +4,7 @@
 from flask import Flask, request, jsonify
 
 from .bot.config import TELEGRAM_TOKEN
-from .bot.tools.handlers import CommandHandler
-from .bot.tools.handlers import SessionHandler
-from .bot.tools.handlers import CallbackQueryHandler
+from .bot.tools.handlers import Webhook
 
 app = Flask(__name__)
 
@@ -17,24 +15,8 @@ def get_updates():
     if request.method == "POST":
         updates = request.get_json()
 
-        if "message" in updates:
-            message = updates["message"]
-
-            if ("entities" in message and
-                    message["entities"][0]["type"] == "bot_command"):
-                command_handler = CommandHandler(message)
-                command_handler.handler()
-            else:
-                session_handler = SessionHandler(message)
-                session_handler.handler()
-
-        elif "callback_query" in updates:
-            callback_query = updates["callback_query"]
-
-            callback_query_handler = CallbackQueryHandler(callback_query)
-            callback_query_handler.handler()
-
-        return jsonify(updates)
+        payload, status = Webhook.receive(updates)
+        return jsonify(payload), status
     return "<h1>Error!</h1>"
 
 if __name__ == "__main__":
@@ -8,8 +8,102 @@ USERS_DATABASE = os.environ.get("USERS_DATABASE_NAME")
 COLLECTIONS_DATABASE = os.environ.get("COLLECTIONS_DATABASE_NAME")
 MESSAGES_DATABASE = os.environ.get("MESSAGES_DATABASE_NAME")
 
+DATABASE_POOL_MIN_SIZE = int(os.environ.get("DATABASE_POOL_MIN_SIZE", 1))
+DATABASE_POOL_MAX_SIZE = int(os.environ.get("DATABASE_POOL_MAX_SIZE", 10))
+DATABASE_POOL_MAX_LIFETIME = int(
+    os.environ.get("DATABASE_POOL_MAX_LIFETIME", 1800)
+)
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 10))
+DATABASE_POOL_HEALTH_CHECK = int(
+    os.environ.get("DATABASE_POOL_HEALTH_CHECK", 30)
+)
+
+MESSAGES_CATALOG_TTL = int(os.environ.get("MESSAGES_CATALOG_TTL", 300))
+
 TELEGRAM_TOKEN = os.environ.get("TOKEN")
 TELEGRAM_URL = "https://api.telegram.org/bot{}/{}"
+TELEGRAM_FILE_URL = "https://api.telegram.org/file/bot{}/{}"
+TELEGRAM_POOL_SIZE = int(os.environ.get("TELEGRAM_POOL_SIZE", 10))
+TELEGRAM_CONNECT_TIMEOUT = float(
+    os.environ.get("TELEGRAM_CONNECT_TIMEOUT", 5)
+)
+TELEGRAM_READ_TIMEOUT = float(os.environ.get("TELEGRAM_READ_TIMEOUT", 10))
+
+# Outbound rate limits, Telegram allows ~30 calls/s and ~1 call/s per chat.
+# TELEGRAM_RATE and TELEGRAM_BURST are shared by TELEGRAM_PROCESSES.
+TELEGRAM_RATE = float(os.environ.get("TELEGRAM_RATE", 30))
+TELEGRAM_BURST = float(os.environ.get("TELEGRAM_BURST", 30))
+TELEGRAM_CHAT_RATE = float(os.environ.get("TELEGRAM_CHAT_RATE", 1))
+TELEGRAM_CHAT_BURST = float(os.environ.get("TELEGRAM_CHAT_BURST", 3))
+TELEGRAM_MAX_WAIT = float(os.environ.get("TELEGRAM_MAX_WAIT", 5))
+TELEGRAM_MAX_RETRIES = int(os.environ.get("TELEGRAM_MAX_RETRIES", 2))
+
+# Return one Telegram method call in the response to the webhook.
+WEBHOOK_REPLY = os.environ.get("WEBHOOK_REPLY", "false").lower() == "true"
+
+# Deliver outbound Telegram calls from background threads, 0 disables it.
+OUTBOUND_WORKERS = int(os.environ.get("OUTBOUND_WORKERS", 0))
+OUTBOUND_QUEUE_SIZE = int(os.environ.get("OUTBOUND_QUEUE_SIZE", 1000))
+OUTBOUND_QUEUE_TIMEOUT = float(os.environ.get("OUTBOUND_QUEUE_TIMEOUT", 1))
+OUTBOUND_DRAIN_TIMEOUT = float(os.environ.get("OUTBOUND_DRAIN_TIMEOUT", 10))
+
+# Acknowledge webhooks at once and handle updates in background threads,
+# 0 disables it. When a queue is full, UPDATE_OVERFLOW decides what to do:
+# "block" waits up to UPDATE_QUEUE_TIMEOUT and then asks Telegram to retry,
+# "reject" asks Telegram to retry at once, "drop" discards the update.
+UPDATE_WORKERS = int(os.environ.get("UPDATE_WORKERS", 0))
+UPDATE_QUEUE_SIZE = int(os.environ.get("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_QUEUE_TIMEOUT = float(os.environ.get("UPDATE_QUEUE_TIMEOUT", 2))
+UPDATE_OVERFLOW = os.environ.get("UPDATE_OVERFLOW", "block").lower()
+UPDATE_DRAIN_TIMEOUT = float(os.environ.get("UPDATE_DRAIN_TIMEOUT", 30))
+
+# Handle queued updates in worker processes instead of threads, every user
+# always in the same process, 0 disables it. Updates must then be received
+# by a single process, e.g. gunicorn with one worker or the polling runner.
+SHARD_PROCESSES = int(os.environ.get("SHARD_PROCESSES", 0))
+
+# Number of processes calling the Telegram API, each of them limits itself
+# to its share of TELEGRAM_RATE. Defaults to the shard processes, or to the
+# gunicorn workers (WEB_CONCURRENCY) if updates are handled by them.
+TELEGRAM_PROCESSES = int(os.environ.get(
+    "TELEGRAM_PROCESSES",
+    SHARD_PROCESSES or os.environ.get("WEB_CONCURRENCY", 1)
+))
+
+# Number of latest update identifiers remembered to drop redeliveries.
+# UPDATE_LOG_PERSISTENT also records them in the database, so replays are
+# recognized across worker processes and restarts.
+UPDATE_LOG_SIZE = int(os.environ.get("UPDATE_LOG_SIZE", 10000))
+UPDATE_LOG_PERSISTENT = (
+    os.environ.get("UPDATE_LOG_PERSISTENT", "false").lower() == "true"
+)
+
+# Cache of user rows: "strict" keeps them until evicted and is only safe
+# when every user is handled by one process, "ttl" keeps them for
+# USER_CACHE_TTL seconds, "off" disables the cache.
+USER_CACHE = os.environ.get(
+    "USER_CACHE", "strict" if SHARD_PROCESSES else "off"
+).lower()
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 5))
+
+# Long polling, used when the bot is run without a webhook.
+POLLING_TIMEOUT = int(os.environ.get("POLLING_TIMEOUT", 30))
+POLLING_LIMIT = int(os.environ.get("POLLING_LIMIT", 100))
 
 COLLECTIONS_PER_PAGE = 8
 CARDS_PER_PAGE = 8
+
+# Pagination of collection and card lists, "offset" or "keyset".
+# Keyset pages are ordered by name and have no page numbers. Pages stored
+# with the other mode are read as the first page after switching.
+PAGINATION = os.environ.get("PAGINATION", "offset").lower()
+
+# Bulk import of cards from CSV and TSV documents. Telegram lets bots
+# download files of up to 20 MB. The chunk size is in characters.
+IMPORT_MAX_SIZE = int(os.environ.get("IMPORT_MAX_SIZE", 20 * 1024 * 1024))
+IMPORT_MAX_CARDS = int(os.environ.get("IMPORT_MAX_CARDS", 10000))
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 65536))
+
+# Attempts to apply a card review that races with another review.
+REVIEW_ATTEMPTS = 3
@@ -1,13 +1,17 @@
 """
     Implementation of bot menu templates.
 """
-from .tools.helpers import Tools, MenuTemplate
+from .tools.helpers import Tools, Keyboard, MenuTemplate
+
+# Header of the callback data handled by the `Collection` object.
+COLLECTION_HEADER = "CoLSe"
 
 
 class CollectionTemplates:
     """Collection menu templates.
     """
     @staticmethod
+    @Keyboard.compiled
     def info_template(locale: str, key: str) -> MenuTemplate:
         """Info menu template.
 
@@ -56,6 +60,7 @@ class CollectionTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def collections_template(locale: str) -> MenuTemplate:
         """Collections menu template.
 
@@ -104,6 +109,7 @@ class CollectionTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def public_key_template(locale: str, key: str) -> MenuTemplate:
         """Public Key menu template.
 
@@ -128,6 +134,7 @@ class CollectionTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def edit_menu_template(locale: str, key: str) -> MenuTemplate:
         """Edit Menu template.
 
@@ -172,6 +179,7 @@ class CollectionTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def delete_menu_template(locale: str, key: str) -> MenuTemplate:
         """Delete Menu template.
 
@@ -200,6 +208,7 @@ class CollectionTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def delete_confirmation_template(locale: str) -> MenuTemplate:
         """Delete Confirmation menu template.
 
@@ -227,6 +236,7 @@ class CardTemplates:
     """Card menu templates.
     """
     @staticmethod
+    @Keyboard.compiled
     def info_template(locale: str, key: str, card_key: str) -> MenuTemplate:
         """Card info menu template.
 
@@ -272,6 +282,7 @@ class CardTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def cards_template(locale: str, key: str) -> MenuTemplate:
         """Cards menu template.
 
@@ -290,6 +301,12 @@ class CardTemplates:
                     header="CaRSe", data=f"add_card/{key}",
                     name="add_card", locale=locale
                 ),
+                Tools.identified_button_template(
+                    header="CaRSe", data=f"import_cards/{key}",
+                    name="import_cards", locale=locale
+                )
+            ),
+            Tools.layer_template(
                 Tools.identified_button_template(
                     header="CoLSe", data=f"info/{key}",
                     name="back", locale=locale
@@ -322,6 +339,7 @@ class CardTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def delete_menu_template(
         locale: str,
         key: str,
@@ -355,6 +373,7 @@ class CardTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def delete_confirmation_template(locale: str, key: str) -> MenuTemplate:
         """Delete Confirmation menu template.
 
@@ -379,6 +398,32 @@ class CardTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
+    def import_template(locale: str, key: str) -> MenuTemplate:
+        """Card Import result menu template.
+
+        Args:
+            locale: A variable defining the user's language and
+                    any special preferences that the user wants to see in
+                    their user interface.
+            key: Unique identifier for the collection.
+
+        Returns:
+            template: Card Import result menu template.
+        """
+        template = Tools.menu_template(
+            Tools.layer_template(
+                Tools.identified_button_template(
+                    header="CaRSe", data=f"collection_cards/{key}",
+                    name="return_to_collection", locale=locale
+                )
+            )
+        )
+
+        return template
+
+    @staticmethod
+    @Keyboard.compiled
     def answer_menu(locale: str, key: str, card_key: str) -> MenuTemplate:
         """Menu with a choice of correctness of the answer.
 
@@ -409,6 +454,7 @@ class CardTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def learning_menu(locale: str, key: str, card_key: str) -> MenuTemplate:
         """Card study menu.
 
@@ -442,6 +488,7 @@ class MenuTemplates:
     """Main menu templates
     """
     @staticmethod
+    @Keyboard.compiled
     def private_office_template(locale: str) -> MenuTemplate:
         """Private Office menu template.
 
@@ -468,6 +515,7 @@ class MenuTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def settings_template(locale: str) -> MenuTemplate:
         """Settings menu template.
 
@@ -496,6 +544,7 @@ class MenuTemplates:
         return template
 
     @staticmethod
+    @Keyboard.compiled
     def locale_settings_template(locale: str) -> MenuTemplate:
         """Locale Settings menu template.
 
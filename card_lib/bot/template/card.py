@@ -1,14 +1,21 @@
 """
     Implementation of tools for working with the `Card` object.
 """
+import logging
 from datetime import datetime
 from typing import Any, Optional
 
 from ..shortcuts import CardTemplates
-from ..tools.helpers import Bot, Tools, Errors
-from ..tools.database import Select, Insert, Update, Delete
-from ..config import CARDS_PER_PAGE
-from ..config import USERS_DATABASE, COLLECTIONS_DATABASE, MESSAGES_DATABASE
+from ..tools.helpers import API, Bot, Tools, Errors
+from ..tools.imports import CardReader
+from ..tools.catalog import MessageCatalog
+from ..tools.database import Select, Insert, Update, Delete, Record
+from ..tools.database import UnitOfWork
+from ..config import CARDS_PER_PAGE, REVIEW_ATTEMPTS, PAGINATION
+from ..config import IMPORT_MAX_SIZE
+from ..config import USERS_DATABASE, COLLECTIONS_DATABASE
+
+logger = logging.getLogger(__name__)
 
 # pylint: disable=unsubscriptable-object
 class Card:
@@ -71,16 +78,16 @@ class Card:
             self.show_answer()
 
         elif self.session_data in ("correct_answer", "wrong_answer"):
-            if self.session_data == "correct_answer":
-                self._difficulty_calculation(True)
-            else:
-                self._difficulty_calculation(False)
-
-            self.collection_learning()
+            correct_answer = self.session_data == "correct_answer"
+            if self._difficulty_calculation(correct_answer):
+                self.collection_learning()
 
         elif self.session_data == "add_card":
             self.new_card_session()
 
+        elif self.session_data == "import_cards":
+            self.import_session()
+
         elif "edit" in self.session_data:
             if self.session_data == "edit_name":
                 self._edit_attribute_session("name")
@@ -98,13 +105,23 @@ class Card:
         elif "level" in self.session_data:
             self._change_level()
 
+        elif "page_" in self.session_data:
+            self._change_page()
+
         else:
             self.info()
 
     def session_handler(self) -> None:
         """Card properties change handler.
         """
-        if self.session_data == "create":
+        if self.session_data == "import":
+            self.import_cards()
+
+        # Cards are named and described with text only.
+        elif self.message_text is None:
+            self.text_required()
+
+        elif self.session_data == "create":
             self.new_card()
 
         elif self.session_data in ("edit_name", "edit_description"):
@@ -112,44 +129,86 @@ class Card:
 
     @Bot.edit_message
     @Bot.answer_callback_query
-    def cards(self) -> None:
+    def cards(
+        self,
+        direction: Optional[str] = "from",
+        boundary: Optional[int] = None
+    ) -> None:
         """Show all user cards.
+
+        Args:
+            direction: Position of a keyset page relative to the boundary
+                       card. Defaults to "from", the current page.
+            boundary: Identifier of the boundary card.
+                      Defaults to None, the first card of the page.
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
         with Select(COLLECTIONS_DATABASE) as select:
-            level = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="page_level"
+            collection = select.collection_row(
+                self.user_id, self.key, "page_level", "name"
             )
-            collection_name = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="name"
+
+        self.title = MessageCatalog.message(
+            data="cards",
+            locale=self.locale
+        ).format(collection.name)
+
+        if PAGINATION == "keyset":
+            level = collection.page_level
+            with Select(COLLECTIONS_DATABASE) as select:
+                cards_list, has_previous, has_next = select.cards_keyset_page(
+                    user_id=self.user_id,
+                    key=self.key,
+                    direction=direction,
+                    boundary=(
+                        Tools.page_anchor(level) if boundary is None
+                        else boundary
+                    ),
+                    per_page=CARDS_PER_PAGE
+                )
+
+            # The first card of the page is kept as its anchor.
+            anchor = cards_list[0].id if cards_list else 0
+            if -anchor != level:
+                with Update(COLLECTIONS_DATABASE) as update:
+                    update.collection_attribute(
+                        user_id=self.user_id,
+                        key=self.key,
+                        attribute="page_level",
+                        value=-anchor
+                    )
+
+            navigation = Tools.keyset_navigation(
+                header="CaRSe",
+                list_of_items=cards_list,
+                has_previous=has_previous,
+                has_next=has_next,
+                key=self.key
             )
-            cards_list = select.collection_cards(self.user_id, self.key)
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="cards",
-                locale=self.locale
-            ).format(collection_name)
+        else:
+            with Select(COLLECTIONS_DATABASE) as select:
+                cards_list, number_of_cards = select.cards_page(
+                    user_id=self.user_id,
+                    key=self.key,
+                    level=Tools.page_offset(collection.page_level),
+                    per_page=CARDS_PER_PAGE
+                )
 
-        per_page = CARDS_PER_PAGE
-        navigation = Tools.navigation_creator(
-            header="CaRSe",
-            number_of_items=len(cards_list),
-            level=level,
-            key=self.key,
-            per_page=CARDS_PER_PAGE
-        )
+            navigation = Tools.navigation_creator(
+                header="CaRSe",
+                number_of_items=number_of_cards,
+                level=Tools.page_offset(collection.page_level),
+                key=self.key,
+                per_page=CARDS_PER_PAGE
+            )
         card_buttons = Tools.button_list_creator(
             obj="card",
             header="CaRSe",
             data="info",
-            list_of_items=cards_list[per_page*level:per_page*(level + 1)]
+            list_of_items=cards_list
         )
         buttons = CardTemplates.cards_template(self.locale, self.key)
         self.menu = (navigation + card_buttons + buttons)
@@ -162,28 +221,27 @@ class Card:
             self.locale = select.user_attribute(self.user_id, "locale")
 
         with Select(COLLECTIONS_DATABASE) as select:
-            collection_cards = select.collection_cards(self.user_id, self.key)
+            due_card = select.next_due_card(self.user_id, self.key)
 
-        if len(collection_cards) < 1:
+        if due_card is None:
             Errors.empty_collection(self.callback_id, self.locale)
         else:
-            self.next_card()
+            self.next_card(due_card)
 
     @Errors.collection_existence_check
     @Bot.edit_message
     @Bot.answer_callback_query
-    def next_card(self) -> None:
+    def next_card(self, due_card: Record) -> None:
         """Get the next card for training.
-        """
-        with Select(COLLECTIONS_DATABASE) as select:
-            collection_cards = select.collection_cards(self.user_id, self.key)
 
-        weak_card = sorted(collection_cards, key=lambda x: x[8])[0]
-        self.title = weak_card[4]
+        Args:
+            due_card: The card with the nearest repetition date.
+        """
+        self.title = due_card.name
         self.menu = CardTemplates.learning_menu(
             locale=self.locale,
             key=self.key,
-            card_key=weak_card[3]
+            card_key=due_card.card_key
         )
         self.parse_mode = "Markdown"
 
@@ -223,28 +281,17 @@ class Card:
             self.locale = select.user_attribute(self.user_id, "locale")
 
         with Select(COLLECTIONS_DATABASE) as select:
-            name = Tools.text_appearance(
-                select.card_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    card_key=self.card_key,
-                    attribute="name"
-                )
-            )
-            description = Tools.text_appearance(
-                select.card_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    card_key=self.card_key,
-                    attribute="description"
-                )
+            card = select.card_row(
+                self.user_id, self.key, self.card_key, "name", "description"
             )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="description_info",
-                locale=self.locale
-            ).format(name, description)
+        name = Tools.text_appearance(card.name)
+        description = Tools.text_appearance(card.description)
+
+        self.title = MessageCatalog.message(
+            data="description_info",
+            locale=self.locale
+        ).format(name, description)
 
         self.menu = CardTemplates.info_template(
             locale=self.locale,
@@ -253,23 +300,23 @@ class Card:
         )
         self.parse_mode="MarkdownV2"
 
+    @Bot.send_message
+    def text_required(self) -> None:
+        """Reject a message without text, keeping the current session.
+        """
+        with Select(USERS_DATABASE) as select:
+            self.locale = select.user_attribute(self.user_id, "locale")
+
+        self.text = MessageCatalog.message("an_error_occurred", self.locale)
+
     @Bot.send_message
     def new_card(self) -> None:
         """Create a new user card.
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
-            cards = select.user_attribute(self.user_id, "cards")
 
-        with Select(COLLECTIONS_DATABASE) as select:
-            collection_cards = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="cards"
-            )
-
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("new_card", self.locale)
+        self.text = MessageCatalog.message("new_card", self.locale)
 
         with Insert(COLLECTIONS_DATABASE) as insert:
             insert.new_card(
@@ -283,15 +330,10 @@ class Card:
 
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", None)
-            update.user_attribute(self.user_id, "cards", cards + 1)
+            update.user_counter(self.user_id, "cards", 1)
 
         with Update(COLLECTIONS_DATABASE) as update:
-            update.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="cards",
-                value=collection_cards + 1
-            )
+            update.collection_counter(self.user_id, self.key, "cards", 1)
 
         self.message_menu = CardTemplates.new_card_template(
             key=self.key,
@@ -307,14 +349,104 @@ class Card:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("create_card", self.locale)
+        self.text = MessageCatalog.message("create_card", self.locale)
 
         session = f"UsrCaRSe/create/{self.key}/{Tools.new_card_key()}"
 
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", session)
 
+    @Bot.send_message
+    @Bot.answer_callback_query
+    def import_session(self) -> None:
+        """Change current user session to card import session.
+        """
+        with Select(USERS_DATABASE) as select:
+            self.locale = select.user_attribute(self.user_id, "locale")
+
+        self.text = MessageCatalog.message("import_cards_info", self.locale)
+
+        session = f"UsrCaRSe/import/{self.key}"
+
+        with Update(USERS_DATABASE) as update:
+            update.user_attribute(self.user_id, "session", session)
+
+    @Errors.collection_existence_check
+    @Bot.send_message
+    def import_cards(self) -> None:
+        """Create cards from a CSV or TSV document.
+
+        Note:
+            The document is downloaded before the cards are inserted,
+            while the unit of work holds no connection.
+        """
+        with Select(USERS_DATABASE) as select:
+            self.locale = select.user_attribute(self.user_id, "locale")
+
+        unit_of_work = UnitOfWork.current()
+        if unit_of_work:
+            unit_of_work.release()
+
+        document = self.message.get("document")
+        download = None
+        if document and document.get("file_size", 0) <= IMPORT_MAX_SIZE:
+            download = API.download(document["file_id"])
+
+        if download is None:
+            self.text = MessageCatalog.message("import_failed", self.locale)
+            return
+
+        # The collection may have been deleted during the download.
+        with Select(COLLECTIONS_DATABASE) as select:
+            collection_id = select.collection_attribute(
+                self.user_id, self.key, "id", for_update=True
+            )
+
+        if collection_id is None:
+            download.close()
+            self.text = MessageCatalog.message("does_not_exist", self.locale)
+            with Update(USERS_DATABASE) as update:
+                update.user_attribute(self.user_id, "session", None)
+            return
+
+        reader = CardReader(
+            stream=download,
+            delimiter=CardReader.delimiter_of(
+                document.get("file_name", ""), document.get("mime_type", "")
+            )
+        )
+        cards = (
+            (card_key, name, description)
+            for (name, description), card_key in zip(reader, Tools.card_keys())
+        )
+
+        with download, Insert(COLLECTIONS_DATABASE) as insert:
+            imported = insert.imported_cards(
+                user_id=self.user_id,
+                key=self.key,
+                cards=cards,
+                next_repetition_date=int(datetime.now().timestamp())
+            )
+
+        with Update(USERS_DATABASE) as update:
+            update.user_attribute(self.user_id, "session", None)
+            update.user_counter(self.user_id, "cards", imported)
+
+        with Update(COLLECTIONS_DATABASE) as update:
+            update.collection_counter(
+                self.user_id, self.key, "cards", imported
+            )
+
+        self.text = MessageCatalog.message(
+            data="cards_imported",
+            locale=self.locale
+        ).format(imported, reader.skipped)
+
+        self.message_menu = CardTemplates.import_template(
+            locale=self.locale,
+            key=self.key
+        )
+
     @Errors.card_and_collection_existence_check
     @Bot.edit_message
     @Bot.answer_callback_query
@@ -324,11 +456,10 @@ class Card:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="card_delete_confirm",
-                locale=self.locale
-            )
+        self.title = MessageCatalog.message(
+            data="card_delete_confirm",
+            locale=self.locale
+        )
 
         self.menu = CardTemplates.delete_menu_template(
             locale=self.locale,
@@ -344,44 +475,23 @@ class Card:
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
-            cards = select.user_attribute(self.user_id, "cards")
-
-        with Select(COLLECTIONS_DATABASE) as select:
-            collection_cards = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="cards"
-            )
-            page_level = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="page_level"
-            )
 
         with Delete(COLLECTIONS_DATABASE) as delete:
-            delete.card(self.user_id, self.key, self.card_key)
+            deleted = delete.card(self.user_id, self.key, self.card_key)
 
-        with Update(USERS_DATABASE) as update:
-            update.user_attribute(self.user_id, "cards", cards - 1)
+        # A card deleted concurrently is only counted once.
+        if deleted:
+            with Update(USERS_DATABASE) as update:
+                update.user_counter(self.user_id, "cards", -1)
 
-        with Update(COLLECTIONS_DATABASE) as update:
-            if collection_cards >= 1:
-                update.collection_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    attribute="cards",
-                    value=collection_cards - 1
-                )
-            if page_level >= 1:
-                update.collection_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    attribute="page_level",
-                    value=page_level - 1
-                )
+            with Update(COLLECTIONS_DATABASE) as update:
+                update.collection_counter(self.user_id, self.key, "cards", -1)
+                if PAGINATION == "offset":
+                    update.collection_counter(
+                        self.user_id, self.key, "page_level", -1
+                    )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message("card_deleted", self.locale)
+        self.title = MessageCatalog.message("card_deleted", self.locale)
 
         self.menu = CardTemplates.delete_confirmation_template(
             locale=self.locale,
@@ -397,8 +507,9 @@ class Card:
         attribute = self.session_data.split("_")[1]
 
         with Select(USERS_DATABASE) as select:
-            self.locale = select.user_attribute(self.user_id, "locale")
-            self.message_id = select.user_attribute(self.user_id, "menu_id")
+            user = select.user_row(self.user_id, "locale", "menu_id")
+            self.locale = user.locale
+            self.message_id = user.menu_id
 
         with Update(COLLECTIONS_DATABASE) as update:
             update.card_attribute(
@@ -412,35 +523,23 @@ class Card:
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", None)
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message(
-                data=f"card_{attribute}_changed",
-                locale=self.locale
-            )
+        self.text = MessageCatalog.message(
+            data=f"card_{attribute}_changed",
+            locale=self.locale
+        )
 
         with Select(COLLECTIONS_DATABASE) as select:
-            name = Tools.text_appearance(
-                select.card_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    card_key=self.card_key,
-                    attribute="name"
-                )
-            )
-            description = Tools.text_appearance(
-                select.card_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    card_key=self.card_key,
-                    attribute="description"
-                )
+            card = select.card_row(
+                self.user_id, self.key, self.card_key, "name", "description"
             )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="description_info",
-                locale=self.locale
-            ).format(name, description)
+        name = Tools.text_appearance(card.name)
+        description = Tools.text_appearance(card.description)
+
+        self.title = MessageCatalog.message(
+            data="description_info",
+            locale=self.locale
+        ).format(name, description)
 
         self.menu = CardTemplates.info_template(
             locale=self.locale,
@@ -463,11 +562,10 @@ class Card:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message(
-                data=f"edit_card_{attribute}",
-                locale=self.locale
-            )
+        self.text = MessageCatalog.message(
+            data=f"edit_card_{attribute}",
+            locale=self.locale
+        )
 
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", key)
@@ -486,80 +584,81 @@ class Card:
 
         self.cards()
 
+    def _change_page(self) -> None:
+        """Move to the keyset page before or after the current one.
+        """
+        direction, boundary = Tools.define_page(self.session_data)
+        self.cards(direction, boundary)
+
     @Errors.card_and_collection_existence_check
-    def _difficulty_calculation(self, correct_answer: bool) -> None:
+    def _difficulty_calculation(self, correct_answer: bool) -> bool:
         """Change the difficulty of the card based on the user's response.
+
+        Note:
+            If the card is reviewed concurrently more than
+            `REVIEW_ATTEMPTS` times, the answer is not recorded.
+
+        Returns:
+            True if learning goes on, False if the card
+            no longer exists and the learning is over.
         """
-        with Select(COLLECTIONS_DATABASE) as select:
-            difficulty = select.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="difficulty"
-            )
-            repetition = select.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="repetition"
-            )
-            easy_factor = select.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="easy_factor"
-            )
+        for _ in range(REVIEW_ATTEMPTS):
+            with Select(COLLECTIONS_DATABASE) as select:
+                card = select.card_row(
+                    self.user_id, self.key, self.card_key,
+                    "difficulty", "repetition", "easy_factor"
+                )
 
-        if correct_answer:
-            if difficulty < 5:
-                difficulty += 1
-        else:
-            if difficulty > 0:
-                difficulty -= 1
+            if card is None:
+                Errors.does_not_exist(self.user_id, self.callback_id)
+                return False
+            difficulty, repetition, easy_factor = card
 
-        next_repetition_date, easy_factor = Tools.memorization_algorithm(
-            repetition=repetition,
-            difficulty=difficulty,
-            easy_factor=easy_factor
-        )
-        current_time = int(datetime.now().timestamp())
-        next_repetition_date += current_time
-        next_repetition_date = min(current_time + 172800, next_repetition_date)
+            if correct_answer:
+                if difficulty < 5:
+                    difficulty += 1
+            else:
+                if difficulty > 0:
+                    difficulty -= 1
 
-        with Update(COLLECTIONS_DATABASE) as update:
-            update.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="difficulty",
-                value=difficulty
-            )
-            update.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="repetition",
-                value=repetition + 1
+            next_repetition_date, easy_factor = Tools.memorization_algorithm(
+                repetition=repetition,
+                difficulty=difficulty,
+                easy_factor=easy_factor
             )
-            update.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="next_repetition_date",
-                value=next_repetition_date
-            )
-            update.card_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key,
-                attribute="easy_factor",
-                value=easy_factor
+            current_time = int(datetime.now().timestamp())
+            next_repetition_date += current_time
+            next_repetition_date = min(
+                current_time + 172800,
+                next_repetition_date
             )
 
+            with Update(COLLECTIONS_DATABASE) as update:
+                review = update.card_review(
+                    user_id=self.user_id,
+                    key=self.key,
+                    card_key=self.card_key,
+                    repetition=repetition,
+                    difficulty=difficulty,
+                    next_repetition_date=next_repetition_date,
+                    easy_factor=easy_factor
+                )
+
+            # Otherwise the card was reviewed concurrently and
+            # the new state is calculated again from the current one.
+            if review:
+                return True
+
+        logger.warning(
+            "Review of card %s of user %s was given up after %s attempts",
+            self.card_key, self.user_id, REVIEW_ATTEMPTS
+        )
+        return True
+
     def _session_initialization(self) -> None:
         if self.message:
             self.user_id = self.message["chat"]["id"]
-            self.message_text = self.message["text"]
+            self.message_text = self.message.get("text")
             self.user_date = self.message["date"]
 
         if self.callback_query:
@@ -3,11 +3,12 @@
 """
 from typing import Any, Optional
 
-from ..shortcuts import CollectionTemplates
+from ..shortcuts import CollectionTemplates, COLLECTION_HEADER
 from ..tools.helpers import Bot, Tools, Errors
+from ..tools.catalog import MessageCatalog
 from ..tools.database import Select, Insert, Update, Delete
-from ..config import COLLECTIONS_PER_PAGE
-from ..config import USERS_DATABASE, COLLECTIONS_DATABASE, MESSAGES_DATABASE
+from ..config import COLLECTIONS_PER_PAGE, PAGINATION
+from ..config import USERS_DATABASE, COLLECTIONS_DATABASE
 
 # pylint: disable=unsubscriptable-object
 class Collection:
@@ -87,6 +88,9 @@ class Collection:
         elif "level" in self.session_data:
             self._change_level()
 
+        elif "page_" in self.session_data:
+            self._change_page()
+
         else:
             self.info()
 
@@ -104,32 +108,73 @@ class Collection:
 
     @Bot.edit_message
     @Bot.answer_callback_query
-    def collections(self) -> None:
+    def collections(
+        self,
+        direction: Optional[str] = "from",
+        boundary: Optional[int] = None
+    ) -> None:
         """Show all user collections.
+
+        Args:
+            direction: Position of a keyset page relative to the boundary
+                       collection. Defaults to "from", the current page.
+            boundary: Identifier of the boundary collection.
+                      Defaults to None, the first collection of the page.
         """
         with Select(USERS_DATABASE) as select:
-            self.locale = select.user_attribute(self.user_id, "locale")
-            level = select.user_attribute(self.user_id, "page_level")
+            user = select.user_row(self.user_id, "locale", "page_level")
+            self.locale = user.locale
+            level = user.page_level
+
+        self.title = MessageCatalog.message("collections", self.locale)
+
+        if PAGINATION == "keyset":
+            with Select(COLLECTIONS_DATABASE) as select:
+                collections_list, has_previous, has_next = (
+                    select.collections_keyset_page(
+                        user_id=self.user_id,
+                        direction=direction,
+                        boundary=(
+                            Tools.page_anchor(level) if boundary is None
+                            else boundary
+                        ),
+                        per_page=COLLECTIONS_PER_PAGE
+                    )
+                )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message("collections", self.locale)
+            # The first collection of the page is kept as its anchor.
+            anchor = collections_list[0].id if collections_list else 0
+            if -anchor != level:
+                with Update(USERS_DATABASE) as update:
+                    update.user_attribute(self.user_id, "page_level", -anchor)
+
+            navigation = Tools.keyset_navigation(
+                header=COLLECTION_HEADER,
+                list_of_items=collections_list,
+                has_previous=has_previous,
+                has_next=has_next
+            )
 
-        with Select(COLLECTIONS_DATABASE) as select:
-            collections_list = select.user_collections(self.user_id)
-
-        per_page = COLLECTIONS_PER_PAGE
-        navigation = Tools.navigation_creator(
-            header="CoLSe",
-            number_of_items=len(collections_list),
-            level=level,
-            per_page=per_page
-        )
-        items = collections_list[per_page*level:per_page*(level + 1)]
+        else:
+            level = Tools.page_offset(level)
+            with Select(COLLECTIONS_DATABASE) as select:
+                collections_list, number_of_collections = (
+                    select.collections_page(
+                        self.user_id, level, COLLECTIONS_PER_PAGE
+                    )
+                )
+
+            navigation = Tools.navigation_creator(
+                header=COLLECTION_HEADER,
+                number_of_items=number_of_collections,
+                level=level,
+                per_page=COLLECTIONS_PER_PAGE
+            )
         collection_buttons = Tools.button_list_creator(
             obj="collection",
-            header="CoLSe",
+            header=COLLECTION_HEADER,
             data="info",
-            list_of_items=items
+            list_of_items=collections_list
         )
         buttons = CollectionTemplates.collections_template(self.locale)
         self.menu = (navigation + collection_buttons + buttons)
@@ -140,21 +185,15 @@ class Collection:
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
-            collections = select.user_attribute(self.user_id, "collections")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("new_collection", self.locale)
+        self.text = MessageCatalog.message("new_collection", self.locale)
 
         with Insert(COLLECTIONS_DATABASE) as insert:
             insert.new_collection(self.user_id, self.key, self.message_text)
 
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", None)
-            update.user_attribute(
-                user_id=self.user_id,
-                attribute="collections",
-                value=collections + 1
-            )
+            update.user_counter(self.user_id, "collections", 1)
 
         self.message_menu = CollectionTemplates.new_collection_template(
             key=self.key,
@@ -164,47 +203,37 @@ class Collection:
     @Bot.send_message
     def copy_collection(self) -> None:
         """Copy another user's collection.
+
+        Note:
+            If the collection was deleted after it was found, the user
+            is told that it no longer exists.
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
-            collections = select.user_attribute(self.user_id, "collections")
-            cards = select.user_attribute(self.user_id, "cards")
-
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("copy_collection", self.locale)
 
         with Insert(COLLECTIONS_DATABASE) as insert:
             new_key = Tools.new_collection_key()
-            insert.copy_collection(self.user_id, self.message_text, new_key)
-
-        with Select(COLLECTIONS_DATABASE) as select:
-            new_cards = select.collection_attribute(
-                user_id=self.user_id,
-                key=new_key,
-                attribute="cards"
-            )
-            name = select.collection_attribute(
-                user_id=self.user_id,
-                key=new_key,
-                attribute="name"
+            collection = insert.copy_collection(
+                self.user_id, self.message_text, new_key
             )
 
+        if collection is None:
+            self.text = MessageCatalog.message("does_not_exist", self.locale)
+
+            with Update(USERS_DATABASE) as update:
+                update.user_attribute(self.user_id, "session", None)
+            return
+
+        self.text = MessageCatalog.message("copy_collection", self.locale)
+
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", None)
-            update.user_attribute(
-                user_id=self.user_id,
-                attribute="cards",
-                value=cards + new_cards
-            )
-            update.user_attribute(
-                user_id=self.user_id,
-                attribute="collections",
-                value=collections + 1
-            )
+            update.user_counter(self.user_id, "cards", collection.cards)
+            update.user_counter(self.user_id, "collections", 1)
 
         self.message_menu = CollectionTemplates.new_collection_template(
             key=new_key,
-            name=name
+            name=collection.name
         )
 
     @Errors.collection_existence_check
@@ -217,28 +246,23 @@ class Collection:
             self.locale = select.user_attribute(self.user_id, "locale")
 
         with Select(COLLECTIONS_DATABASE) as select:
-            name = Tools.text_appearance(
-                select.collection_attribute(self.user_id, self.key, "name")
-            )
-            description = Tools.text_appearance(
-                select.collection_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    attribute="description"
-                )
+            collection = select.collection_row(
+                self.user_id, self.key, "name", "description"
             )
 
-        with Select(MESSAGES_DATABASE) as select:
-            if description:
-                self.title = select.bot_message(
-                    data="description_info",
-                    locale=self.locale
-                ).format(name, description)
-            else:
-                self.title = select.bot_message(
-                    data="collection_info",
-                    locale=self.locale
-                ).format(name)
+        name = Tools.text_appearance(collection.name)
+        description = Tools.text_appearance(collection.description)
+
+        if description:
+            self.title = MessageCatalog.message(
+                data="description_info",
+                locale=self.locale
+            ).format(name, description)
+        else:
+            self.title = MessageCatalog.message(
+                data="collection_info",
+                locale=self.locale
+            ).format(name)
 
         self.menu = CollectionTemplates.info_template(self.locale, self.key)
         self.parse_mode = "MarkdownV2"
@@ -252,11 +276,10 @@ class Collection:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="public_key_text",
-                locale=self.locale
-            ).format(self.key)
+        self.title = MessageCatalog.message(
+            data="public_key_text",
+            locale=self.locale
+        ).format(self.key)
 
         self.menu = CollectionTemplates.public_key_template(
             locale=self.locale,
@@ -274,22 +297,17 @@ class Collection:
             self.locale = select.user_attribute(self.user_id, "locale")
 
         with Select(COLLECTIONS_DATABASE) as select:
-            name = Tools.text_appearance(
-                select.collection_attribute(self.user_id, self.key, "name")
-            )
-            description = Tools.text_appearance(
-                select.collection_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    attribute="description"
-                )
+            collection = select.collection_row(
+                self.user_id, self.key, "name", "description"
             )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="description_info",
-                locale=self.locale
-            ).format(name, description)
+        name = Tools.text_appearance(collection.name)
+        description = Tools.text_appearance(collection.description)
+
+        self.title = MessageCatalog.message(
+            data="description_info",
+            locale=self.locale
+        ).format(name, description)
 
         self.menu = CollectionTemplates.edit_menu_template(
             locale=self.locale,
@@ -306,11 +324,10 @@ class Collection:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="delete_confirmation",
-                locale=self.locale
-            )
+        self.title = MessageCatalog.message(
+            data="delete_confirmation",
+            locale=self.locale
+        )
 
         self.menu = CollectionTemplates.delete_menu_template(
             locale=self.locale,
@@ -325,40 +342,19 @@ class Collection:
         """
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
-            collections = select.user_attribute(self.user_id, "collections")
-            cards = select.user_attribute(self.user_id, "cards")
-            page_level = select.user_attribute(self.user_id, "page_level")
-
-        with Select(COLLECTIONS_DATABASE) as select:
-            collection_cards = select.collection_attribute(
-                user_id=self.user_id,
-                key=self.key,
-                attribute="cards"
-            )
 
         with Delete(COLLECTIONS_DATABASE) as delete:
-            delete.collection(self.user_id, self.key)
+            cards = delete.collection(self.user_id, self.key)
 
-        with Update(USERS_DATABASE) as update:
-            update.user_attribute(
-                user_id=self.user_id,
-                attribute="collections",
-                value=collections - 1
-            )
-            update.user_attribute(
-                user_id=self.user_id,
-                attribute="cards",
-                value=cards - collection_cards
-            )
-            if page_level >= 1:
-                update.user_attribute(
-                    user_id=self.user_id,
-                    attribute="page_level",
-                    value=page_level - 1
-                )
+        # A concurrent confirmation has already deleted the collection.
+        if cards is not None:
+            with Update(USERS_DATABASE) as update:
+                update.user_counter(self.user_id, "collections", -1)
+                update.user_counter(self.user_id, "cards", -cards)
+                if PAGINATION == "offset":
+                    update.user_counter(self.user_id, "page_level", -1)
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message("collection_deleted", self.locale)
+        self.title = MessageCatalog.message("collection_deleted", self.locale)
 
         self.menu = CollectionTemplates.delete_confirmation_template(
             locale=self.locale
@@ -372,8 +368,7 @@ class Collection:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("create_collection", self.locale)
+        self.text = MessageCatalog.message("create_collection", self.locale)
 
         session = f"UsrCoLSe/create/{Tools.new_collection_key()}"
 
@@ -389,8 +384,9 @@ class Collection:
         attribute = self.session_data.split("_")[1]
 
         with Select(USERS_DATABASE) as select:
-            self.locale = select.user_attribute(self.user_id, "locale")
-            self.message_id = select.user_attribute(self.user_id, "menu_id")
+            user = select.user_row(self.user_id, "locale", "menu_id")
+            self.locale = user.locale
+            self.message_id = user.menu_id
 
         with Update(COLLECTIONS_DATABASE) as update:
             update.collection_attribute(
@@ -403,29 +399,23 @@ class Collection:
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", None)
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message(
-                data=f"collection_{attribute}_changed",
-                locale=self.locale
-            )
+        self.text = MessageCatalog.message(
+            data=f"collection_{attribute}_changed",
+            locale=self.locale
+        )
 
         with Select(COLLECTIONS_DATABASE) as select:
-            name = Tools.text_appearance(
-                select.collection_attribute(self.user_id, self.key, "name")
-            )
-            description = Tools.text_appearance(
-                select.collection_attribute(
-                    user_id=self.user_id,
-                    key=self.key,
-                    attribute="description"
-                )
+            collection = select.collection_row(
+                self.user_id, self.key, "name", "description"
             )
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.title = select.bot_message(
-                data="description_info",
-                locale=self.locale
-            ).format(name, description)
+        name = Tools.text_appearance(collection.name)
+        description = Tools.text_appearance(collection.description)
+
+        self.title = MessageCatalog.message(
+            data="description_info",
+            locale=self.locale
+        ).format(name, description)
 
         self.menu = CollectionTemplates.edit_menu_template(
             locale=self.locale,
@@ -448,11 +438,10 @@ class Collection:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message(
-                data=f"edit_collection_{attribute}",
-                locale=self.locale
-            )
+        self.text = MessageCatalog.message(
+            data=f"edit_collection_{attribute}",
+            locale=self.locale
+        )
 
         with Update(USERS_DATABASE) as update:
             update.user_attribute(self.user_id, "session", key)
@@ -470,6 +459,12 @@ class Collection:
 
         self.collections()
 
+    def _change_page(self) -> None:
+        """Move to the keyset page before or after the current one.
+        """
+        direction, boundary = Tools.define_page(self.session_data)
+        self.collections(direction, boundary)
+
     def _session_initialization(self) -> None:
         if self.message:
             self.user_id = self.message["chat"]["id"]
@@ -4,10 +4,12 @@
 from typing import Any, Callable
 
 from ..tools.helpers import Bot, Tools
+from ..tools.catalog import MessageCatalog
 from ..tools.database import Select, Update
 from ..shortcuts import MenuTemplates, CollectionTemplates
-from ..config import COLLECTIONS_PER_PAGE
-from ..config import USERS_DATABASE, COLLECTIONS_DATABASE, MESSAGES_DATABASE
+from ..shortcuts import COLLECTION_HEADER
+from ..config import COLLECTIONS_PER_PAGE, PAGINATION
+from ..config import USERS_DATABASE, COLLECTIONS_DATABASE
 
 
 class Menu:
@@ -78,8 +80,7 @@ class Menu:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("private_office", self.locale)
+        self.text = MessageCatalog.message("private_office", self.locale)
 
         self.menu = MenuTemplates.private_office_template(self.locale)
 
@@ -89,8 +90,7 @@ class Menu:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("start", self.locale)
+        self.text = MessageCatalog.message("start", self.locale)
 
         self.parse_mode = "Markdown"
         self.disable_web_page_preview = True
@@ -103,8 +103,7 @@ class Menu:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("settings", self.locale)
+        self.text = MessageCatalog.message("settings", self.locale)
 
         self.menu = MenuTemplates.settings_template(self.locale)
 
@@ -116,11 +115,10 @@ class Menu:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message(
-                data="current_language",
-                locale=self.locale
-            ).format(locale_list[self.locale])
+        self.text = MessageCatalog.message(
+            data="current_language",
+            locale=self.locale
+        ).format(locale_list[self.locale])
 
         self.menu = MenuTemplates.locale_settings_template(self.locale)
         self.parse_mode = "MarkdownV2"
@@ -129,28 +127,56 @@ class Menu:
         """User collections template.
         """
         with Select(USERS_DATABASE) as select:
-            self.locale = select.user_attribute(self.user_id, "locale")
-            level = select.user_attribute(self.user_id, "page_level")
-
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("collections", self.locale)
-
-        with Select(COLLECTIONS_DATABASE) as select:
-            collections_list = select.user_collections(self.user_id)
-
-        per_page = COLLECTIONS_PER_PAGE
-        navigation = Tools.navigation_creator(
-            header="CoLsSe",
-            number_of_items=len(collections_list),
-            level=level,
-            per_page=per_page
-        )
-        items = collections_list[per_page*level:per_page*(level + 1)]
+            user = select.user_row(self.user_id, "locale", "page_level")
+            self.locale = user.locale
+            level = user.page_level
+
+        self.text = MessageCatalog.message("collections", self.locale)
+
+        if PAGINATION == "keyset":
+            with Select(COLLECTIONS_DATABASE) as select:
+                collections_list, has_previous, has_next = (
+                    select.collections_keyset_page(
+                        user_id=self.user_id,
+                        direction="from",
+                        boundary=Tools.page_anchor(level),
+                        per_page=COLLECTIONS_PER_PAGE
+                    )
+                )
+
+            # The first collection of the page is kept as its anchor.
+            anchor = collections_list[0].id if collections_list else 0
+            if -anchor != level:
+                with Update(USERS_DATABASE) as update:
+                    update.user_attribute(self.user_id, "page_level", -anchor)
+
+            navigation = Tools.keyset_navigation(
+                header=COLLECTION_HEADER,
+                list_of_items=collections_list,
+                has_previous=has_previous,
+                has_next=has_next
+            )
+
+        else:
+            level = Tools.page_offset(level)
+            with Select(COLLECTIONS_DATABASE) as select:
+                collections_list, number_of_collections = (
+                    select.collections_page(
+                        self.user_id, level, COLLECTIONS_PER_PAGE
+                    )
+                )
+
+            navigation = Tools.navigation_creator(
+                header=COLLECTION_HEADER,
+                number_of_items=number_of_collections,
+                level=level,
+                per_page=COLLECTIONS_PER_PAGE
+            )
         collection_buttons = Tools.button_list_creator(
             obj="collection",
-            header="CoLSe",
+            header=COLLECTION_HEADER,
             data="info",
-            list_of_items=items
+            list_of_items=collections_list
         )
         buttons = CollectionTemplates.collections_template(self.locale)
         self.menu = (navigation + collection_buttons + buttons)
@@ -164,8 +190,7 @@ class Menu:
         with Select(USERS_DATABASE) as select:
             self.locale = select.user_attribute(self.user_id, "locale")
 
-        with Select(MESSAGES_DATABASE) as select:
-            self.text = select.bot_message("cancel", self.locale)
+        self.text = MessageCatalog.message("cancel", self.locale)
 
     def _callback_query_init(self) -> None:
         self.callback_id = self.callback_query["id"]
@@ -0,0 +1,106 @@
+"""
+    Implementation of the in-process cache of user state.
+"""
+import time
+import threading
+from typing import Any, Union
+from collections import OrderedDict
+
+from ..config import USER_CACHE, USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+# pylint: disable=unsubscriptable-object
+class UserCache:
+    """Rows of the users table kept in the memory of the worker.
+
+    Note:
+        In "strict" mode entries never expire, which is only consistent
+        when every user is handled by a single process, e.g. with shard
+        processes. In "ttl" mode entries expire after `USER_CACHE_TTL`
+        seconds, bounding how stale a row changed by another process can
+        be. The cache is disabled in "off" mode.
+    """
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+
+    # Counters of the cache activity.
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def enabled() -> bool:
+        """Check whether the cache is used.
+
+        Returns:
+            True if the cache is enabled, False otherwise.
+        """
+        return USER_CACHE in ("ttl", "strict")
+
+    @staticmethod
+    def get(user_id: int) -> Union[dict[str, Any], None]:
+        """Get the cached state of a user.
+
+        Args:
+            user_id: Unique identifier of the target user.
+
+        Returns:
+            user_state: Cached attributes of the user if they are present
+                        and fresh, None otherwise.
+        """
+        with UserCache._lock:
+            entry = UserCache._entries.get(user_id)
+
+            # An empty state has nothing to read.
+            if (entry is None or not entry[0] or
+                    (USER_CACHE == "ttl" and
+                     time.monotonic() - entry[1] > USER_CACHE_TTL)):
+                UserCache._entries.pop(user_id, None)
+                UserCache.misses += 1
+                return None
+
+            UserCache._entries.move_to_end(user_id)
+            UserCache.hits += 1
+            return entry[0]
+
+    @staticmethod
+    def put(user_id: int, user_state: dict[str, Any]) -> dict[str, Any]:
+        """Cache the state of a user.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            user_state: Attributes of the user, changed in place
+                        once later updates of the user are committed.
+
+        Returns:
+            user_state: The cached attributes.
+        """
+        with UserCache._lock:
+            UserCache._entries[user_id] = (user_state, time.monotonic())
+            UserCache._entries.move_to_end(user_id)
+
+            if len(UserCache._entries) > USER_CACHE_SIZE:
+                UserCache._entries.popitem(last=False)
+        return user_state
+
+    @staticmethod
+    def invalidate(user_id: int) -> None:
+        """Drop the cached state of a user.
+
+        Args:
+            user_id: Unique identifier of the target user.
+        """
+        with UserCache._lock:
+            UserCache._entries.pop(user_id, None)
+
+    @staticmethod
+    def metrics() -> dict[str, int]:
+        """Get user cache metrics.
+
+        Returns:
+            metrics: Number of cached users, hits and misses.
+        """
+        return {
+            "size": len(UserCache._entries),
+            "hits": UserCache.hits,
+            "misses": UserCache.misses
+        }
@@ -0,0 +1,105 @@
+"""
+    Implementation of the in-memory catalog of bot messages.
+"""
+import os
+import time
+import threading
+from typing import Union, Optional
+
+from .database import Select
+from ..config import MESSAGES_DATABASE, MESSAGES_CATALOG_TTL
+
+
+class MessageCatalog:
+    """Bot messages kept in the memory of the worker.
+
+    Note:
+        The catalog is loaded from the `messages` table on first use in
+        every process. At most once per `MESSAGES_CATALOG_TTL` seconds the
+        version of the table is compared with the loaded one, and the
+        catalog is reloaded if the table has changed.
+    """
+    _messages = {}
+    _version = None
+    _checked = 0.0
+    _pid = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def message(
+        data: str,
+        locale: Optional[str] = "en"
+    ) -> Union[str, None]:
+        """Get bot message.
+
+        Args:
+            data: Unique message identifier.
+            locale: A variable defining the user's language and
+                    any special preferences that the user wants to see in
+                    their user interface. Defaults to "en".
+
+        Returns:
+            message: Bot message if successful, None otherwise.
+        """
+        MessageCatalog._refresh()
+        return MessageCatalog._messages.get((locale, data))
+
+    @staticmethod
+    def version() -> tuple[int, int]:
+        """Get the version of the loaded messages.
+
+        Returns:
+            version: Number of messages and the largest message revision.
+        """
+        MessageCatalog._refresh()
+        return MessageCatalog._version
+
+    @staticmethod
+    def reload() -> None:
+        """Load all bot messages from the database.
+        """
+        with MessageCatalog._lock:
+            MessageCatalog._load()
+
+    @staticmethod
+    def invalidate() -> None:
+        """Make the next lookup check the version of the messages table.
+        """
+        MessageCatalog._checked = 0.0
+
+    @staticmethod
+    def _refresh() -> None:
+        pid = os.getpid()
+        now = time.monotonic()
+        if (MessageCatalog._pid == pid and
+                now - MessageCatalog._checked < MESSAGES_CATALOG_TTL):
+            return
+
+        with MessageCatalog._lock:
+            if MessageCatalog._pid != pid:
+                MessageCatalog._load()
+                return
+
+            if now - MessageCatalog._checked < MESSAGES_CATALOG_TTL:
+                return
+
+            with Select(MESSAGES_DATABASE) as select:
+                version = select.messages_version()
+
+            if version != MessageCatalog._version:
+                MessageCatalog._load()
+            else:
+                MessageCatalog._checked = now
+
+    @staticmethod
+    def _load() -> None:
+        with Select(MESSAGES_DATABASE) as select:
+            version = select.messages_version()
+            messages = select.bot_messages()
+
+        MessageCatalog._messages = {
+            (locale, data): message for locale, data, message in messages
+        }
+        MessageCatalog._version = version
+        MessageCatalog._checked = time.monotonic()
+        MessageCatalog._pid = os.getpid()
@@ -0,0 +1,215 @@
+"""
+    Implementation of coalescing of repeated message edits.
+"""
+import json
+import threading
+import itertools
+from typing import Any, Union, Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import OrderedDict
+
+# Ticket of the update that is currently being processed.
+_current_ticket = ContextVar("current_edit_ticket", default=None)
+
+# Variable defining the type of message key, a (chat_id, message_id) pair.
+MessageKey = tuple[int, int]
+
+# Variable defining the type of edit ticket.
+Ticket = tuple[MessageKey, int]
+
+
+# pylint: disable=unsubscriptable-object
+class EditCoalescer:
+    """Latest pending render and last sent content of every bot message.
+
+    Note:
+        Every callback query gets a ticket for the message its button
+        belongs to when the update arrives. Only the newest ticket of
+        a message is rendered, older ones are skipped. An edit with the
+        same text and keyboard as the last one Telegram confirmed for
+        the message is not sent at all.
+
+        The state is kept per process, so an update can only be
+        superseded by one that waits in the same process: in a batch
+        of the long-polling runner or in the queue of `UPDATE_WORKERS`.
+        Without background workers every update is handled before the
+        next one arrives. Shard processes receive their tickets from
+        the dispatching process and never see a newer one.
+    """
+    max_messages = 10000
+
+    _tickets = OrderedDict()
+    _sent = OrderedDict()
+    _counter = itertools.count(1)
+    _lock = threading.Lock()
+
+    # Counters of skipped edits.
+    superseded = 0
+    unmodified = 0
+
+    @staticmethod
+    def register(update: dict[str, Any]) -> Union[Ticket, None]:
+        """Give an incoming update a ticket for the message it edits.
+
+        Args:
+            update: An object containing all information
+                    about the incoming update.
+
+        Returns:
+            ticket: Message key and ticket number if the update is
+                    a callback query, None otherwise.
+        """
+        callback_query = update.get("callback_query")
+        if not callback_query or "message" not in callback_query:
+            return None
+
+        message = callback_query["message"]
+        key = (message["chat"]["id"], message["message_id"])
+        keyboard = EditCoalescer._keyboard_digest(message.get("reply_markup"))
+
+        with EditCoalescer._lock:
+            number = next(EditCoalescer._counter)
+            EditCoalescer._remember(EditCoalescer._tickets, key, number)
+
+            # The message no longer shows what was sent last,
+            # so the next edit must not be skipped.
+            sent = EditCoalescer._sent.get(key)
+            if sent and sent[1] != keyboard:
+                del EditCoalescer._sent[key]
+        return key, number
+
+    @staticmethod
+    @contextmanager
+    def tracking(ticket: Union[Ticket, None]) -> Iterator[None]:
+        """Make the ticket current while the update is processed.
+
+        Args:
+            ticket: Ticket received from `register`.
+        """
+        token = _current_ticket.set(ticket)
+        try:
+            yield
+        finally:
+            _current_ticket.reset(token)
+
+    @staticmethod
+    def is_superseded(
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None
+    ) -> bool:
+        """Check whether a newer update will render the message.
+
+        Args:
+            chat_id: Unique identifier for the target chat.
+                     Defaults to None, the message of the current ticket.
+            message_id: Unique message identifier.
+                        Defaults to None, the message of the current ticket.
+
+        Returns:
+            True if the current update is stale, False otherwise.
+        """
+        ticket = _current_ticket.get()
+        if ticket is None:
+            return False
+
+        key, number = ticket
+        if chat_id is not None and key != (chat_id, message_id):
+            return False
+
+        with EditCoalescer._lock:
+            if EditCoalescer._tickets.get(key, number) == number:
+                return False
+            EditCoalescer.superseded += 1
+            return True
+
+    @staticmethod
+    def is_modified(
+        chat_id: int,
+        message_id: int,
+        text: str,
+        markup: Optional[str] = None
+    ) -> bool:
+        """Check whether an edit changes the message.
+
+        Args:
+            chat_id: Unique identifier for the target chat.
+            message_id: Unique message identifier.
+            text: New text of the message.
+            markup: New keyboard of the message as a JSON string.
+                    Defaults to None.
+
+        Returns:
+            True if the edit has to be sent, False otherwise.
+        """
+        key = (chat_id, message_id)
+        keyboard = json.loads(markup) if markup else None
+        digest = (hash(text), EditCoalescer._keyboard_digest(keyboard))
+
+        with EditCoalescer._lock:
+            if EditCoalescer._sent.get(key) == digest:
+                EditCoalescer.unmodified += 1
+                return False
+            return True
+
+    @staticmethod
+    def confirm(
+        chat_id: int,
+        message_id: int,
+        text: str,
+        markup: Optional[str] = None
+    ) -> None:
+        """Remember the content of an edit confirmed by Telegram.
+
+        Args:
+            chat_id: Unique identifier for the target chat.
+            message_id: Unique message identifier.
+            text: New text of the message.
+            markup: New keyboard of the message as a JSON string.
+                    Defaults to None.
+        """
+        key = (chat_id, message_id)
+        keyboard = json.loads(markup) if markup else None
+        digest = (hash(text), EditCoalescer._keyboard_digest(keyboard))
+
+        with EditCoalescer._lock:
+            EditCoalescer._remember(EditCoalescer._sent, key, digest)
+
+    @staticmethod
+    def forget(chat_id: int, message_id: int) -> None:
+        """Forget the last sent content of a message.
+
+        Args:
+            chat_id: Unique identifier for the target chat.
+            message_id: Unique message identifier.
+        """
+        with EditCoalescer._lock:
+            EditCoalescer._sent.pop((chat_id, message_id), None)
+
+    @staticmethod
+    def metrics() -> dict[str, int]:
+        """Get edit coalescing metrics.
+
+        Returns:
+            metrics: Counters of superseded and unmodified edits.
+        """
+        return {
+            "superseded": EditCoalescer.superseded,
+            "unmodified": EditCoalescer.unmodified
+        }
+
+    @staticmethod
+    def _keyboard_digest(
+        reply_markup: Union[dict[str, Any], None]
+    ) -> Union[int, None]:
+        if not reply_markup:
+            return None
+        return hash(json.dumps(reply_markup, sort_keys=True))
+
+    @staticmethod
+    def _remember(store: OrderedDict, key: MessageKey, value: Any) -> None:
+        store[key] = value
+        store.move_to_end(key)
+
+        if len(store) > EditCoalescer.max_messages:
+            store.popitem(last=False)
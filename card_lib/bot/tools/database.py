@@ -2,46 +2,376 @@
     Implementation of tools for working with a database.
 """
 from __future__ import annotations
-from typing import Type, Union, Optional
+import io
+import csv
+import time
+from typing import Any, Type, Union, Optional, NamedTuple, Iterable, Callable
 from types import TracebackType
-import psycopg2
-from psycopg2 import sql
-
-from ..config import POSTGRESQL_DATABASE_URL, COLLECTIONS_DATABASE
+from functools import lru_cache
+from collections import namedtuple
+from contextvars import ContextVar
+from psycopg2 import sql, extensions
+
+from .pool import ConnectionPool
+from .cache import UserCache
+from ..config import IMPORT_CHUNK_SIZE
+
+# Variable defining the type of a row with the requested columns.
+Record = NamedTuple
+
+# Variable defining the type of prefetched user attributes.
+UserState = dict[str, Any]
+
+# Comparison of the page rows with the boundary row, by page direction.
+KEYSET_DIRECTIONS = {
+    "first": None,
+    "last": None,
+    "from": ">=",
+    "after": ">",
+    "before": "<"
+}
+
+# Columns of the users table that can be prefetched.
+USER_COLUMNS = (
+    "user_id", "username", "locale", "collections",
+    "cards", "menu_id", "page_level", "session"
+)
+
+# Own and shared cards of a collection, both filtered by user identifier
+# and collection key. "card" is the cards row, so a condition on it can
+# be added and the rows read in the order of an index.
+CARD_BRANCHES = (
+    sql.SQL(
+        """SELECT card.id, card.key, card.card_key, card.name
+           FROM cards AS card
+           WHERE card.user_id=%s AND
+                 card.key=%s AND
+                 NOT card.deleted{}"""
+    ),
+    sql.SQL(
+        """SELECT card.id, collections.key, card.card_key, card.name
+           FROM collections
+           JOIN collections AS origin
+             ON origin.key=collections.source_key
+           JOIN cards AS card
+             ON card.user_id=origin.user_id AND
+                card.key=origin.key AND
+                card.id<=collections.source_id
+           WHERE collections.user_id=%s AND
+                 collections.key=%s AND
+                 NOT card.deleted AND
+                 NOT EXISTS (SELECT 1 FROM cards AS own
+                             WHERE own.user_id=collections.user_id AND
+                                   own.key=collections.key AND
+                                   own.card_key=card.card_key){}"""
+    )
+)
+
+# Unit of work of the update that is currently being processed.
+_current_unit_of_work = ContextVar("current_unit_of_work", default=None)
 
 # pylint: disable=unsubscriptable-object
-class CreateTable:
-    """Class responsible for creating tables in the database.
+class UnitOfWork:
+    """One connection and one transaction for everything done
+    while processing a single update.
+
+    Note:
+        While a unit of work is active, every `Database` context borrows
+        its connection instead of taking one from the pool, and nothing
+        is committed until the unit of work itself is left.
+
+        User attributes fetched in advance, or taken from the user cache,
+        are read from `prefetched` instead of the database. They may be
+        shared with other updates, so user updates are kept in `staged`
+        and only written through to them, or to the user cache, once the
+        transaction is committed. Results of existence checks are kept
+        in `existence` until a collection or card is inserted or deleted.
+
+        Functions passed to `after_commit`, e.g. Telegram calls telling
+        the user about a change, are only run once the transaction is
+        committed, so no locks are held while they wait and nothing is
+        announced that is then rolled back.
+
+    Attributes:
+        prefetched: Attributes of users, keyed by user identifier.
+                    Defaults to None.
+    """
+    def __init__(
+        self,
+        prefetched: Optional[dict[int, UserState]] = None
+    ) -> None:
+        self.prefetched = prefetched or {}
+        self.staged = {}
+        self.existence = {}
+
+        self._pool = None
+        self._connection = None
+        self._token = None
+        self._after_commit = []
+
+    def __enter__(self) -> UnitOfWork:
+        self._token = _current_unit_of_work.set(self)
+        return self
+
+    def __exit__(self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        _current_unit_of_work.reset(self._token)
+        committed = traceback is None
+
+        if self._connection is not None:
+            try:
+                if committed:
+                    self._connection.commit()
+                else:
+                    self._connection.rollback()
+            finally:
+                self._pool.putconn(self._connection)
+                self._connection = None
+
+        if committed:
+            self._apply_staged()
+        self.staged.clear()
+        self._run_after_commit(committed)
+
+    @staticmethod
+    def current() -> Optional[UnitOfWork]:
+        """Get the active unit of work.
+
+        Returns:
+            unit_of_work: Unit of work if one is active, None otherwise.
+        """
+        return _current_unit_of_work.get()
+
+    def connection(self) -> extensions.connection:
+        """Get the connection of the unit of work,
+        borrowing it from the pool on first use.
+
+        Returns:
+            connection: Database connection.
+        """
+        if self._connection is None:
+            self._pool = ConnectionPool.instance()
+            self._connection = self._pool.getconn()
+        return self._connection
+
+    def release(self) -> None:
+        """Commit the work done so far and return the connection
+        to the pool.
+
+        Note:
+            The next query borrows a connection again. This is meant for
+            slow work that needs no database, e.g. a download, so that no
+            connection or lock is held meanwhile. No `Database` context
+            may be open when the unit of work is released.
+        """
+        if self._connection is None:
+            return
+
+        try:
+            self._connection.commit()
+        finally:
+            self._pool.putconn(self._connection)
+            self._connection = None
+
+        self._apply_staged()
+        self.staged.clear()
+        self.existence.clear()
+        self._run_after_commit(True)
+
+    def after_commit(self, function: Callable[[], Any]) -> None:
+        """Run a function once the transaction is committed.
+
+        Note:
+            Functions are run in the order they were added and are
+            dropped if the unit of work is rolled back.
+
+        Args:
+            function: Function called without arguments.
+        """
+        self._after_commit.append(function)
+
+    @staticmethod
+    def user_state(user_id: int) -> Union[UserState, None]:
+        """Get the prefetched or cached attributes of a user.
+
+        Args:
+            user_id: Unique identifier of the target user.
+
+        Returns:
+            user_state: Attributes of the user if there are any,
+                        None otherwise.
+        """
+        unit_of_work = _current_unit_of_work.get()
+        if not unit_of_work:
+            return None
+
+        user_state = unit_of_work.prefetched.get(user_id)
+        if not user_state and UserCache.enabled():
+            user_state = UserCache.get(user_id)
+            if user_state:
+                unit_of_work.prefetched[user_id] = user_state
+        if not user_state:
+            return None
+
+        changes = unit_of_work.staged.get(user_id)
+        return {**user_state, **changes} if changes else user_state
+
+    @staticmethod
+    def stage(user_id: int, attribute: str, value: Union[str, int]) -> bool:
+        """Remember a changed user attribute until the commit.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            attribute: The name of the changed attribute.
+            value: New attribute value.
+
+        Returns:
+            True if the change was staged, False if no unit
+            of work is active.
+        """
+        unit_of_work = _current_unit_of_work.get()
+        if not unit_of_work:
+            return False
+
+        unit_of_work.staged.setdefault(user_id, {})[attribute] = value
+        return True
+
+    def _run_after_commit(self, committed: bool) -> None:
+        functions, self._after_commit = self._after_commit, []
+        if committed:
+            for function in functions:
+                function()
+
+    def _apply_staged(self) -> None:
+        # Committed user changes become visible to other updates.
+        for user_id, changes in self.staged.items():
+            user_state = self.prefetched.get(user_id)
+            if user_state:
+                user_state.update(changes)
+            else:
+                UserCache.invalidate(user_id)
+
+
+class Database:
+    """Base class for database context managers.
+
+    Note:
+        A connection is borrowed from the pool of the current process on
+        the first query, leaving the context commits or rolls back and
+        returns the connection to the pool. Inside a `UnitOfWork` the
+        connection of the unit of work is used and the transaction is
+        left open.
 
     Attributes:
         db_name: Name of the database to connect to.
     """
     def __init__(self, db_name: str) -> None:
-        self.db_name = db_name
+        self._db_name = db_name
 
+        self._unit_of_work = None
+        self._pool = None
         self._connection = None
-        self._cursor = None
-
-    def __enter__(self) -> CreateTable:
-        self._connection = psycopg2.connect(
-            POSTGRESQL_DATABASE_URL, sslmode='require'
-        )
-        self._cursor = self._connection.cursor()
+        self._open_cursor = None
+        self._changed_users = set()
 
+    def __enter__(self) -> Database:
+        self._unit_of_work = UnitOfWork.current()
         return self
 
     def __exit__(self,
         exc_type: Optional[Type[BaseException]],
         exc_value: Optional[BaseException],
         traceback: Optional[TracebackType]
-    ) -> CreateTable:
-        if traceback is None:
-            self._connection.commit()
-        else:
-            self._connection.rollback()
+    ) -> None:
+        if self._open_cursor is None:
+            return
+
+        if self._unit_of_work:
+            self._open_cursor.close()
+            return
+
+        try:
+            if traceback is None:
+                self._connection.commit()
+            else:
+                self._connection.rollback()
+
+            self._open_cursor.close()
+        finally:
+            self._pool.putconn(self._connection)
+
+            # Cached users are dropped once their change is committed.
+            for user_id in self._changed_users:
+                UserCache.invalidate(user_id)
+
+    def _stage_user(
+        self,
+        user_id: int,
+        attribute: str,
+        value: Union[str, int]
+    ) -> None:
+        if not UnitOfWork.stage(user_id, attribute, value):
+            self._changed_users.add(user_id)
+
+    @staticmethod
+    def _forget_existence() -> None:
+        unit_of_work = UnitOfWork.current()
+        if unit_of_work:
+            unit_of_work.existence.clear()
+
+    def _materialize_cards(self, condition: str, values: tuple) -> None:
+        # Shared cards matching the condition become rows of their own.
+        self._cursor.execute(
+            sql.SQL(
+                """INSERT INTO cards (
+                   user_id,
+                   key,
+                   card_key,
+                   name,
+                   description,
+                   repetition,
+                   difficulty,
+                   next_repetition_date,
+                   easy_factor
+                )
+                SELECT shared.user_id, shared.key, shared.card_key,
+                       shared.name, shared.description, shared.repetition,
+                       shared.difficulty, shared.next_repetition_date,
+                       shared.easy_factor
+                FROM user_cards AS shared
+                JOIN collections
+                  ON collections.user_id=shared.user_id AND
+                     collections.key=shared.key
+                WHERE shared.shared AND {}
+                ON CONFLICT (user_id, key, card_key) DO NOTHING;
+                """
+            ).format(sql.SQL(condition)), values
+        )
 
-        self._cursor.close()
-        self._connection.close()
+    @property
+    def _cursor(self) -> extensions.cursor:
+        if self._open_cursor is None:
+            if self._unit_of_work:
+                self._connection = self._unit_of_work.connection()
+            else:
+                self._pool = ConnectionPool.instance()
+                self._connection = self._pool.getconn()
+            self._open_cursor = self._connection.cursor()
+        return self._open_cursor
+
+
+class CreateTable(Database):
+    """Class responsible for creating tables in the database.
+
+    Attributes:
+        db_name: Name of the database to connect to.
+    """
+    def __init__(self, db_name: str) -> None:
+        super().__init__(db_name)
+        self.db_name = db_name
 
     def bot_messages(self) -> None:
         """Create a bot message table.
@@ -55,6 +385,54 @@ class CreateTable:
             );
             """
         )
+        self.messages_revision()
+
+    def messages_revision(self) -> None:
+        """Number every change of the bot messages table.
+
+        Note:
+            Every inserted or updated message gets the next value of the
+            `messages_revision_seq` sequence, so the catalog notices edits
+            as well as new messages. Messages are made unique by locale
+            and identifier, keeping the latest of duplicate messages.
+        """
+        self._cursor.execute(
+            """CREATE SEQUENCE IF NOT EXISTS messages_revision_seq;
+               ALTER TABLE messages
+               ADD COLUMN IF NOT EXISTS revision bigint NOT NULL
+               DEFAULT nextval('messages_revision_seq');
+            """
+        )
+        self._cursor.execute(
+            """CREATE OR REPLACE FUNCTION messages_revision()
+               RETURNS trigger AS $$
+               BEGIN
+                   NEW.revision := nextval('messages_revision_seq');
+                   RETURN NEW;
+               END;
+               $$ LANGUAGE plpgsql;
+
+               DROP TRIGGER IF EXISTS messages_revision_trigger
+               ON messages;
+               CREATE TRIGGER messages_revision_trigger
+               BEFORE UPDATE ON messages
+               FOR EACH ROW EXECUTE FUNCTION messages_revision();
+            """
+        )
+        self._cursor.execute(
+            """DELETE FROM messages
+               WHERE id IN (SELECT id FROM
+                               (SELECT id, row_number() OVER (
+                                    PARTITION BY locale, data
+                                    ORDER BY id DESC
+                                ) AS number
+                                FROM messages) AS numbered
+                            WHERE number > 1);
+
+               CREATE UNIQUE INDEX IF NOT EXISTS messages_locale_data_idx
+               ON messages (locale, data);
+            """
+        )
 
     def bot_users(self) -> None:
         """Create a bot users table.
@@ -68,6 +446,8 @@ class CreateTable:
                collections integer,
                cards integer,
                menu_id integer,
+               -- Number of the current list page, or with keyset
+               -- pagination the negated identifier of its first item.
                page_level integer,
                session text
             );
@@ -85,10 +465,14 @@ class CreateTable:
                name text,
                description text,
                cards integer,
-               page_level integer
+               -- Current page of the card list, as in users.
+               page_level integer,
+               source_key text,
+               source_id integer
             );
             """
         )
+        self.collections_indexes()
 
     def bot_cards(self) -> None:
         """create a bot user card table.
@@ -104,52 +488,171 @@ class CreateTable:
                repetition integer,
                difficulty integer,
                next_repetition_date integer,
-               easy_factor real
+               easy_factor real,
+               deleted boolean NOT NULL DEFAULT false
             );
             """
         )
+        self.cards_indexes()
+        self.user_cards()
+
+    def collections_indexes(self) -> None:
+        """Create indexes of the bot user collections table.
+        """
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS collections_user_idx
+               ON collections (user_id, id);
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS collections_user_name_idx
+               ON collections (user_id, name, id);
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS collections_key_idx
+               ON collections (key);
+            """
+        )
 
+    def cards_indexes(self) -> None:
+        """Create indexes of the bot user card table.
+        """
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS cards_next_repetition_idx
+               ON cards (user_id, key, next_repetition_date);
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS cards_collection_idx
+               ON cards (user_id, key, id);
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS cards_collection_name_idx
+               ON cards (user_id, key, name, id);
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS cards_key_idx
+               ON cards (key);
+            """
+        )
 
-class Insert:
-    """Class responsible for writing new data to the database.
+    def user_cards(self) -> int:
+        """Create the view of the cards of every user collection.
 
-    Attributes:
-        db_name: Name of the database to connect to.
-    """
-    def __init__(self, db_name) -> None:
-        self._db_name = db_name
+        Note:
+            A copied collection stores no cards of its own, only the key
+            of its source collection and the largest card identifier at
+            the time of copying. Shared cards show the current content of
+            the source with the review state of a new card, until the
+            user reviews or changes them and they get a row of their own.
+            A deleted shared card is hidden by a row marked as deleted.
+            Card keys must be unique within a collection of a user, so
+            duplicate cards of older versions are removed first and only
+            the earliest of them is kept.
 
-        self._connection = None
-        self._cursor = None
+        Returns:
+            removed: Number of removed duplicate cards.
+        """
+        self._cursor.execute(
+            """ALTER TABLE collections
+               ADD COLUMN IF NOT EXISTS source_key text,
+               ADD COLUMN IF NOT EXISTS source_id integer;
+            """
+        )
+        self._cursor.execute(
+            """ALTER TABLE cards
+               ADD COLUMN IF NOT EXISTS deleted boolean NOT NULL
+               DEFAULT false;
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS cards_source_idx
+               ON cards (key, id);
+            """
+        )
+        self._cursor.execute(
+            """DELETE FROM cards
+               USING collections
+               WHERE cards.user_id=collections.user_id AND
+                     cards.key=collections.key AND
+                     collections.source_key IS NULL AND
+                     cards.deleted;
+            """
+        )
+        self._cursor.execute(
+            """CREATE INDEX IF NOT EXISTS collections_source_idx
+               ON collections (source_key);
+            """
+        )
+        self._cursor.execute(
+            """DELETE FROM cards
+               WHERE id IN (SELECT id FROM
+                               (SELECT id, row_number() OVER (
+                                    PARTITION BY user_id, key, card_key
+                                    ORDER BY id
+                                ) AS number
+                                FROM cards) AS numbered
+                            WHERE number > 1);
+            """
+        )
+        removed = self._cursor.rowcount
 
-    def __enter__(self) -> Insert:
-        self._connection = psycopg2.connect(
-            POSTGRESQL_DATABASE_URL, sslmode='require'
+        self._cursor.execute(
+            """CREATE UNIQUE INDEX IF NOT EXISTS cards_card_key_idx
+               ON cards (user_id, key, card_key);
+            """
         )
-        self._cursor = self._connection.cursor()
+        self._cursor.execute(
+            """CREATE OR REPLACE VIEW user_cards AS
+               SELECT id, user_id, key, card_key, name, description,
+                      repetition, difficulty, next_repetition_date,
+                      easy_factor, false AS shared
+               FROM cards
+               WHERE NOT deleted
+               UNION ALL
+               SELECT source.id, collections.user_id, collections.key,
+                      source.card_key, source.name, source.description,
+                      0, 3, 0, 2.5::real, true
+               FROM collections
+               JOIN cards AS source
+                 ON source.key=collections.source_key AND
+                    source.id<=collections.source_id
+               WHERE NOT source.deleted AND
+                     NOT EXISTS (SELECT 1 FROM cards AS own
+                                 WHERE own.user_id=collections.user_id AND
+                                       own.key=collections.key AND
+                                       own.card_key=source.card_key);
+            """
+        )
+        return removed
 
-        return self
+    def bot_updates(self) -> None:
+        """Create a table of handled update identifiers.
+        """
+        self._cursor.execute(
+            """CREATE TABLE IF NOT EXISTS updates (
+               update_id bigint PRIMARY KEY
+            );
+            """
+        )
 
-    def __exit__(self,
-        exc_type: Optional[Type[BaseException]],
-        exc_value: Optional[BaseException],
-        traceback: Optional[TracebackType]
-    ) -> None:
-        if traceback is None:
-            self._connection.commit()
-        else:
-            self._connection.rollback()
 
-        self._cursor.close()
-        self._connection.close()
+class Insert(Database):
+    """Class responsible for writing new data to the database.
 
+    Attributes:
+        db_name: Name of the database to connect to.
+    """
     def new_bot_message(
         self,
         data: str,
         message: str,
         locale: Optional[str] = "en"
     ) -> None:
-        """Insert a new bot message.
+        """Insert a new bot message or change its text.
 
         Args:
             data: Unique message identifier.
@@ -160,7 +663,10 @@ class Insert:
         """
         self._cursor.execute(
             """INSERT INTO messages (locale, data, message)
-               VALUES (%s, %s, %s);
+               VALUES (%s, %s, %s)
+               ON CONFLICT (locale, data) DO UPDATE
+               SET message=EXCLUDED.message
+               WHERE messages.message IS DISTINCT FROM EXCLUDED.message;
             """, (locale, data, message)
         )
 
@@ -214,6 +720,7 @@ class Insert:
             ) VALUES (%s, %s, %s, %s, %s, %s);
             """, (user_id, key, name, "🚫", 0, 0)
         )
+        self._forget_existence()
 
     def new_card(
         self,
@@ -249,95 +756,223 @@ class Insert:
             """, (user_id, key, card_key, name, description,
                   0, 3, next_repetition_date, 2.5)
         )
+        self._forget_existence()
+
+    def imported_cards(
+        self,
+        user_id: int,
+        key: str,
+        cards: Iterable[tuple[str, str, str]],
+        next_repetition_date: int
+    ) -> int:
+        """Insert many new cards with a single COPY.
+
+        Note:
+            Cards are taken from the iterable while they are sent to the
+            database, `IMPORT_CHUNK_SIZE` characters at a time.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            cards: Card key, name and description of every card.
+            next_repetition_date: The time the cards are first reviewed.
+
+        Returns:
+            cards: Number of inserted cards.
+        """
+        stream = _CopyStream(
+            (user_id, key, card_key, name, description,
+             0, 3, next_repetition_date, 2.5)
+            for card_key, name, description in cards
+        )
+        self._cursor.copy_expert(
+            """COPY cards (
+               user_id,
+               key,
+               card_key,
+               name,
+               description,
+               repetition,
+               difficulty,
+               next_repetition_date,
+               easy_factor
+            ) FROM STDIN WITH (FORMAT csv);
+            """, stream, IMPORT_CHUNK_SIZE
+        )
+        self._forget_existence()
+        return stream.rows
+
+    def update_claim(self, update_id: int, window: int) -> bool:
+        """Record that an update is being handled.
+
+        Note:
+            Updates older than the `window` latest recorded ones
+            are never claimed again.
+
+        Args:
+            update_id: Unique identifier of the update.
+            window: Number of latest update identifiers remembered.
+
+        Returns:
+            True if the update was not handled before, False otherwise.
+        """
+        self._cursor.execute(
+            """INSERT INTO updates (update_id)
+               SELECT %s
+               WHERE %s > (SELECT coalesce(max(update_id), 0) - %s
+                           FROM updates)
+               ON CONFLICT (update_id) DO NOTHING
+               RETURNING update_id;
+            """, (update_id, update_id, window)
+        )
+        return self._cursor.fetchone() is not None
 
     def copy_collection(
         self,
         user_id: int,
         key: str,
         new_key: str
-    ) -> None:
+    ) -> Union[Record, None]:
         """Copy existing collection.
 
+        Note:
+            Cards are not duplicated, the copy shares them with the
+            collection it was copied from, see `CreateTable.user_cards`.
+            Only cards a copied collection changed itself are copied
+            again. Copied cards start with the review state of a new card.
+
         Args:
             user_id: Unique identifier of the target user.
             key: Unique identifier for the collection.
             new_key: New unique identifier for the collection.
+
+        Returns:
+            collection: Name and number of cards of the copy if the
+                        collection exists, None otherwise.
         """
+        columns = ("name", "cards")
         self._cursor.execute(
-            """SELECT * FROM collections WHERE key=%s;
-            """, (key,)
+            """INSERT INTO collections (
+               user_id,
+               key,
+               name,
+               description,
+               cards,
+               page_level,
+               source_key,
+               source_id
+            )
+            SELECT %s, %s, source.name || ' - Copy', source.description,
+                   (SELECT count(*) FROM user_cards
+                    WHERE user_id=source.user_id AND key=source.key),
+                   0,
+                   coalesce(source.source_key, source.key),
+                   coalesce(source.source_id,
+                            (SELECT coalesce(max(id), 0) FROM cards
+                             WHERE key=source.key))
+            FROM collections AS source
+            WHERE source.key=%s
+            LIMIT 1
+            RETURNING name, cards, source_key;
+            """, (user_id, new_key, key)
         )
-        info = self._cursor.fetchone()
-
-        with Insert(COLLECTIONS_DATABASE) as insert:
-            insert.new_collection(user_id, new_key, f"{info[3]} - Copy")
+        collection = self._cursor.fetchone()
+        if collection is None:
+            return None
 
-        with Update(COLLECTIONS_DATABASE) as update:
-            update.collection_attribute(
-                user_id=user_id,
-                key=new_key,
-                attribute="description",
-                value=info[4]
-            )
-            update.collection_attribute(user_id, new_key, "cards", info[5])
+        self._forget_existence()
+        if collection[2] == key:
+            return _record_type(columns)(*collection[:2])
 
         self._cursor.execute(
-            """SELECT * FROM cards WHERE key=%s;
-            """, (key,)
+            """INSERT INTO cards (
+               user_id,
+               key,
+               card_key,
+               name,
+               description,
+               repetition,
+               difficulty,
+               next_repetition_date,
+               easy_factor,
+               deleted
+            )
+            SELECT %s, %s, card_key, name, description,
+                   0, 3, next_repetition_date, 2.5, deleted
+            FROM cards
+            WHERE key=%s
+            ORDER BY id;
+            """, (user_id, new_key, key)
         )
-        cards = self._cursor.fetchall()
+        return _record_type(columns)(*collection[:2])
 
-        with Insert(COLLECTIONS_DATABASE) as insert:
-            for card in cards:
-                insert.new_card(
-                    user_id=user_id,
-                    key=new_key,
-                    card_key=card[3],
-                    name=card[4],
-                    description=card[5],
-                    next_repetition_date=card[8]
-                )
 
+@lru_cache(maxsize=None)
+def _record_type(columns: tuple[str, ...]) -> type:
+    """Get the record type for a set of columns.
+
+    Args:
+        columns: Names of the columns, in the order they are selected.
+
+    Returns:
+        record_type: Named tuple type with a field for every column.
+    """
+    return namedtuple("Record", columns)
 
-class Select:
-    """Class responsible for retrieving information from the database.
+
+class _CopyStream:
+    """File-like object reading rows in CSV format for `COPY`.
 
     Attributes:
-        db_name: Name of the database to connect to.
+        rows: Number of rows read so far.
     """
-    def __init__(self, db_name: str) -> None:
-        self._db_name = db_name
+    def __init__(self, rows: Iterable[tuple[Any, ...]]) -> None:
+        self.rows = 0
 
-        self._connection = None
-        self._cursor = None
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
 
-    def __enter__(self) -> Select:
-        self._connection = psycopg2.connect(
-            POSTGRESQL_DATABASE_URL, sslmode='require'
-        )
-        self._cursor = self._connection.cursor()
+    def read(self, size: Optional[int] = -1) -> str:
+        """Read the next rows.
 
-        return self
+        Args:
+            size: Number of characters to read. Defaults to -1,
+                  reading all remaining rows.
 
-    def __exit__(self,
-        exc_type: Optional[Type[BaseException]],
-        exc_value: Optional[BaseException],
-        traceback: Optional[TracebackType]
-    ) -> None:
-        if traceback is None:
-            self._connection.commit()
-        else:
-            self._connection.rollback()
+        Returns:
+            data: Rows in CSV format, empty once all rows were read.
+        """
+        while size < 0 or self._buffer.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
 
-        self._cursor.close()
-        self._connection.close()
+            self._writer.writerow(row)
+            self.rows += 1
 
-    def bot_message(
-        self,
-        data: str,
-        locale: Optional[str] = "en"
-    ) -> Union[str, None]:
-        """Get bot message.
+        data = self._buffer.getvalue()
+        if size < 0:
+            size = len(data)
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._buffer.write(data[size:])
+        return data[:size]
+
+
+class Select(Database):
+    """Class responsible for retrieving information from the database.
+
+    Attributes:
+        db_name: Name of the database to connect to.
+    """
+    def bot_message(
+        self,
+        data: str,
+        locale: Optional[str] = "en"
+    ) -> Union[str, None]:
+        """Get bot message.
 
         Args:
             data: Unique message identifier.
@@ -360,24 +995,66 @@ class Select:
             return message[0]
         return None
 
+    def bot_messages(self) -> list[tuple[str, str, str], ...]:
+        """Get all bot messages.
+
+        Returns:
+            messages: Locale, identifier and text of every message.
+        """
+        self._cursor.execute(
+            """SELECT locale, data, message FROM messages;
+            """
+        )
+
+        messages = self._cursor.fetchall()
+        return messages
+
+    def messages_version(self) -> tuple[int, int]:
+        """Get the version of the bot messages table.
+
+        Note:
+            The largest revision changes with every inserted or edited
+            message, and the number of messages with every deletion.
+
+        Returns:
+            version: Number of messages and the largest message revision.
+        """
+        self._cursor.execute(
+            """SELECT count(*), coalesce(max(revision), 0) FROM messages;
+            """
+        )
+
+        version = self._cursor.fetchone()
+        return version
+
     def user_attribute(
         self,
         user_id: int,
-        attribute: str
+        attribute: str,
+        for_update: Optional[bool] = False
     ) -> Union[str, int, None]:
         """Get user attribute.
 
         Args:
             user_id: Unique identifier of the target user.
             attribute: The name of the attribute whose value you want to get.
+            for_update: Lock the user row until the end of the transaction.
+                        Defaults to False.
 
         Returns:
             attribute_value: Attribute value if successful, None otherwise.
         """
+        user_state = None if for_update else self._user_state(user_id)
+        if user_state and attribute in user_state:
+            return user_state[attribute]
+
         self._cursor.execute(
             sql.SQL(
-                "SELECT {} FROM users WHERE user_id=%s;"
-            ).format(sql.Identifier(attribute)), (user_id,)
+                "SELECT {} FROM users WHERE user_id=%s{};"
+            ).format(
+                sql.Identifier(attribute),
+                sql.SQL(" FOR UPDATE" if for_update else "")
+            ), (user_id,)
         )
 
         attribute_value = self._cursor.fetchone()
@@ -389,7 +1066,8 @@ class Select:
         self,
         user_id: int,
         key: str,
-        attribute: str
+        attribute: str,
+        for_update: Optional[bool] = False
     ) -> Union[str, int, None]:
         """Get collection attribute.
 
@@ -397,14 +1075,19 @@ class Select:
             user_id: Unique identifier of the target user.
             key: Unique identifier for the collection.
             attribute: The name of the attribute whose value you want to get.
+            for_update: Lock the collection row until the end
+                        of the transaction. Defaults to False.
 
         Returns:
             attribute_value: Attribute value if successful, None otherwise.
         """
         self._cursor.execute(
             sql.SQL(
-                "SELECT {} FROM collections WHERE user_id=%s AND key=%s;"
-            ).format(sql.Identifier(attribute)), (user_id, key)
+                "SELECT {} FROM collections WHERE user_id=%s AND key=%s{};"
+            ).format(
+                sql.Identifier(attribute),
+                sql.SQL(" FOR UPDATE" if for_update else "")
+            ), (user_id, key)
         )
 
         attribute_value = self._cursor.fetchone()
@@ -432,7 +1115,7 @@ class Select:
         """
         self._cursor.execute(
             sql.SQL(
-                """SELECT {} FROM cards
+                """SELECT {} FROM user_cards
                    WHERE user_id=%s AND
                          key=%s AND
                          card_key=%s;
@@ -445,6 +1128,122 @@ class Select:
             return attribute_value[0]
         return None
 
+    def user_row(
+        self,
+        user_id: int,
+        *columns: str,
+        for_update: Optional[bool] = False
+    ) -> Union[Record, None]:
+        """Get several user attributes with a single query.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            *columns: The names of the attributes whose values you want to get.
+            for_update: Lock the user row until the end of the transaction.
+                        Defaults to False.
+
+        Returns:
+            row: Record with the requested attributes if successful,
+                 None otherwise.
+        """
+        user_state = None if for_update else self._user_state(user_id)
+        if user_state and all(column in user_state for column in columns):
+            return _record_type(columns)(
+                *(user_state[column] for column in columns)
+            )
+
+        return self._row(
+            table="users",
+            columns=columns,
+            conditions={"user_id": user_id},
+            for_update=for_update
+        )
+
+    def users_rows(
+        self,
+        user_ids: list[int, ...],
+        *columns: str
+    ) -> dict[int, Record]:
+        """Get attributes of several users with a single query.
+
+        Args:
+            user_ids: Unique identifiers of the target users.
+            *columns: The names of the attributes whose values you want to get.
+
+        Returns:
+            rows: Records with the requested attributes,
+                  keyed by user identifier.
+        """
+        if "user_id" not in columns:
+            columns = ("user_id", *columns)
+
+        self._cursor.execute(
+            sql.SQL("SELECT {} FROM users WHERE user_id = ANY(%s);").format(
+                sql.SQL(", ").join(map(sql.Identifier, columns))
+            ), (list(user_ids),)
+        )
+
+        record_type = _record_type(columns)
+        rows = [record_type(*row) for row in self._cursor.fetchall()]
+        return {row.user_id: row for row in rows}
+
+    def collection_row(
+        self,
+        user_id: int,
+        key: str,
+        *columns: str,
+        for_update: Optional[bool] = False
+    ) -> Union[Record, None]:
+        """Get several collection attributes with a single query.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            *columns: The names of the attributes whose values you want to get.
+            for_update: Lock the collection row until the end
+                        of the transaction. Defaults to False.
+
+        Returns:
+            row: Record with the requested attributes if successful,
+                 None otherwise.
+        """
+        return self._row(
+            table="collections",
+            columns=columns,
+            conditions={"user_id": user_id, "key": key},
+            for_update=for_update
+        )
+
+    def card_row(
+        self,
+        user_id: int,
+        key: str,
+        card_key: str,
+        *columns: str,
+        for_update: Optional[bool] = False
+    ) -> Union[Record, None]:
+        """Get several card attributes with a single query.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            card_key: Unique identifier for the card.
+            *columns: The names of the attributes whose values you want to get.
+            for_update: Lock the card row until the end of the transaction.
+                        Defaults to False.
+
+        Returns:
+            row: Record with the requested attributes if successful,
+                 None otherwise.
+        """
+        # Only cards of its own can be locked, shared ones are read as is.
+        return self._row(
+            table="cards" if for_update else "user_cards",
+            columns=columns,
+            conditions={"user_id": user_id, "key": key, "card_key": card_key},
+            for_update=for_update
+        )
+
     def user_collections(
         self,
         user_id: int
@@ -480,13 +1279,324 @@ class Select:
             cards: All collection cards.
         """
         self._cursor.execute(
-            """SELECT * FROM cards WHERE user_id=%s and key=%s;
+            """SELECT * FROM user_cards WHERE user_id=%s and key=%s;
             """, (user_id, key)
         )
 
         cards = self._cursor.fetchall()
         return cards
 
+    def collections_page(
+        self,
+        user_id: int,
+        level: int,
+        per_page: int
+    ) -> tuple[list[Record, ...], int]:
+        """Get one page of user collections.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            level: The level (page) the user is on.
+            per_page: Number of collections per page.
+
+        Returns:
+            page: Key and name of the collections on the page,
+                  and the total number of user collections.
+        """
+        self._cursor.execute(
+            """SELECT key, name FROM collections
+               WHERE user_id=%s
+               ORDER BY id
+               LIMIT %s OFFSET %s;
+            """, (user_id, per_page, per_page*level)
+        )
+        record_type = _record_type(("key", "name"))
+        collections = [record_type(*row) for row in self._cursor.fetchall()]
+
+        self._cursor.execute(
+            """SELECT count(*) FROM collections WHERE user_id=%s;
+            """, (user_id,)
+        )
+        return collections, self._cursor.fetchone()[0]
+
+    def cards_page(
+        self,
+        user_id: int,
+        key: str,
+        level: int,
+        per_page: int
+    ) -> tuple[list[Record, ...], int]:
+        """Get one page of collection cards.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            level: The level (page) the user is on.
+            per_page: Number of cards per page.
+
+        Returns:
+            page: Collection key, card key and name of the cards on
+                  the page, and the total number of collection cards.
+        """
+        self._cursor.execute(
+            """SELECT key, card_key, name FROM user_cards
+               WHERE user_id=%s AND
+                     key=%s
+               ORDER BY id
+               LIMIT %s OFFSET %s;
+            """, (user_id, key, per_page, per_page*level)
+        )
+        record_type = _record_type(("key", "card_key", "name"))
+        cards = [record_type(*row) for row in self._cursor.fetchall()]
+
+        self._cursor.execute(
+            """SELECT count(*) FROM user_cards
+               WHERE user_id=%s AND
+                     key=%s;
+            """, (user_id, key)
+        )
+        return cards, self._cursor.fetchone()[0]
+
+    def collections_keyset_page(
+        self,
+        user_id: int,
+        direction: str,
+        boundary: int,
+        per_page: int
+    ) -> tuple[list[Record, ...], bool, bool]:
+        """Get one page of user collections ordered by name.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            direction: Position of the page relative to the boundary
+                       collection, see `KEYSET_DIRECTIONS`.
+            boundary: Identifier of the boundary collection.
+            per_page: Number of collections per page.
+
+        Returns:
+            page: Identifier, key and name of the collections on the
+                  page, and whether there are pages before and after it.
+        """
+        return self._keyset_page(
+            table="collections",
+            columns=("id", "key", "name"),
+            conditions={"user_id": user_id},
+            direction=direction,
+            boundary=boundary,
+            per_page=per_page
+        )
+
+    def cards_keyset_page(
+        self,
+        user_id: int,
+        key: str,
+        direction: str,
+        boundary: int,
+        per_page: int
+    ) -> tuple[list[Record, ...], bool, bool]:
+        """Get one page of collection cards ordered by name.
+
+        Note:
+            Own and shared cards are read with separate index scans of
+            at most one page each, so deep pages of a copied collection
+            cost no more than the first one.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            direction: Position of the page relative to the boundary
+                       card, see `KEYSET_DIRECTIONS`.
+            boundary: Identifier of the boundary card.
+            per_page: Number of cards per page.
+
+        Returns:
+            page: Identifier, collection key, card key and name of the
+                  cards on the page, and whether there are pages before
+                  and after it.
+        """
+        if direction == "from" and not boundary:
+            direction = "first"
+
+        position = None
+        if direction in ("from", "after", "before"):
+            self._cursor.execute(
+                """SELECT name, id FROM user_cards
+                   WHERE user_id=%s AND
+                         key=%s AND
+                         id=%s;
+                """, (user_id, key, boundary)
+            )
+            position = self._cursor.fetchone()
+
+            # The boundary card is gone, start from the beginning.
+            if position is None:
+                direction = "first"
+
+        # Only the page rows of both kinds of cards are merged.
+        seek = sql.SQL("")
+        seek_values = ()
+        if position is not None:
+            seek = sql.SQL(" AND (card.name, card.id) {} (%s, %s)").format(
+                sql.SQL(KEYSET_DIRECTIONS[direction])
+            )
+            seek_values = tuple(position)
+
+        order = sql.SQL("DESC" if direction in ("before", "last") else "ASC")
+        branches = [
+            sql.SQL("({} ORDER BY card.name {}, card.id {} LIMIT %s)").format(
+                branch.format(seek), order, order
+            )
+            for branch in CARD_BRANCHES
+        ]
+        branch_values = (user_id, key, *seek_values, per_page)
+        self._cursor.execute(
+            sql.SQL(
+                """SELECT id, key, card_key, name
+                   FROM ({} UNION ALL {}) AS page
+                   ORDER BY name {}, id {}
+                   LIMIT %s;
+                """
+            ).format(*branches, order, order),
+            (*branch_values, *branch_values, per_page)
+        )
+
+        record_type = _record_type(("id", "key", "card_key", "name"))
+        rows = [record_type(*row) for row in self._cursor.fetchall()]
+        if direction in ("before", "last"):
+            rows.reverse()
+
+        if not rows:
+            if direction == "first":
+                return rows, False, False
+            return self.cards_keyset_page(user_id, key, "first", 0, per_page)
+
+        exists = [
+            sql.SQL("EXISTS ({})").format(branch.format(
+                sql.SQL(" AND (card.name, card.id) {} (%s, %s)").format(
+                    sql.SQL(comparison)
+                )
+            ))
+            for comparison in ("<", ">")
+            for branch in CARD_BRANCHES
+        ]
+        first = (user_id, key, rows[0].name, rows[0].id)
+        last = (user_id, key, rows[-1].name, rows[-1].id)
+        self._cursor.execute(
+            sql.SQL("SELECT {} OR {}, {} OR {};").format(*exists),
+            (*first, *first, *last, *last)
+        )
+
+        has_previous, has_next = self._cursor.fetchone()
+        return rows, has_previous, has_next
+
+    def existence(
+        self,
+        user_id: int,
+        key: str,
+        card_key: Optional[str] = None
+    ) -> tuple[bool, bool]:
+        """Check whether a collection and one of its cards exist.
+
+        Note:
+            Both checks are made with a single query. Inside a unit of
+            work the results are remembered, so repeated checks of the
+            same collection or card are answered without a query.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            card_key: Unique identifier for the card. Defaults to None,
+                      checking only the collection.
+
+        Returns:
+            existence: Whether the collection exists and whether the card
+                       exists, False for the card if `card_key` is None.
+        """
+        unit_of_work = UnitOfWork.current()
+        memo = unit_of_work.existence if unit_of_work else {}
+
+        collection = ("collection", user_id, key)
+        card = ("card", user_id, key, card_key)
+        if collection in memo and (card_key is None or card in memo):
+            return memo[collection], memo.get(card, False)
+
+        self._cursor.execute(
+            """SELECT EXISTS (SELECT 1 FROM collections
+                              WHERE user_id=%s AND
+                                    key=%s),
+                      EXISTS (SELECT 1 FROM user_cards
+                              WHERE user_id=%s AND
+                                    key=%s AND
+                                    card_key=%s);
+            """, (user_id, key, user_id, key, card_key)
+        )
+
+        collection_exists, card_exists = self._cursor.fetchone()
+        memo[collection] = collection_exists
+        if card_key is not None:
+            memo[card] = card_exists
+        return collection_exists, card_exists
+
+    def next_due_card(
+        self,
+        user_id: int,
+        key: str
+    ) -> Union[Record, None]:
+        """Get the collection card with the nearest repetition date.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+
+        Note:
+            Cards of the user come first while they are due, then the
+            shared cards the user has not reviewed yet, in the order they
+            were added. Both are looked up with index scans.
+
+        Returns:
+            card: Key and name of the card if the collection
+                  is not empty, None otherwise.
+        """
+        record_type = _record_type(("card_key", "name"))
+        self._cursor.execute(
+            """SELECT card_key, name, next_repetition_date <= %s
+               FROM cards
+               WHERE user_id=%s AND
+                     key=%s AND
+                     NOT deleted
+               ORDER BY next_repetition_date
+               LIMIT 1;
+            """, (int(time.time()), user_id, key)
+        )
+        own_card = self._cursor.fetchone()
+        if own_card and own_card[2]:
+            return record_type(*own_card[:2])
+
+        self._cursor.execute(
+            """SELECT source.card_key, source.name
+               FROM collections
+               JOIN cards AS source
+                 ON source.key=collections.source_key AND
+                    source.id<=collections.source_id
+               WHERE collections.user_id=%s AND
+                     collections.key=%s AND
+                     NOT source.deleted AND
+                     NOT EXISTS (SELECT 1 FROM cards AS own
+                                 WHERE own.user_id=collections.user_id AND
+                                       own.key=collections.key AND
+                                       own.card_key=source.card_key)
+               ORDER BY source.id
+               LIMIT 1;
+            """, (user_id, key)
+        )
+        shared_card = self._cursor.fetchone()
+        if shared_card:
+            return record_type(*shared_card)
+
+        if own_card:
+            return record_type(*own_card[:2])
+        return None
+
     def collection_without_user_binding(
         self,
         key: str
@@ -507,40 +1617,138 @@ class Select:
         info = self._cursor.fetchone()
         return info
 
+    def _user_state(self, user_id: int) -> Union[UserState, None]:
+        user_state = UnitOfWork.user_state(user_id)
+        unit_of_work = UnitOfWork.current()
+        if (user_state or not unit_of_work or not UserCache.enabled() or
+                user_id in unit_of_work.staged):
+            return user_state
 
-class Update:
-    """Class responsible for updating data in the database.
+        row = self.users_rows([user_id], *USER_COLUMNS).get(user_id)
+        if row is None:
+            return None
 
-    Attributes:
-        db_name: Name of the database to connect to.
-    """
-    def __init__(self, db_name: str) -> None:
-        self._db_name = db_name
+        user_state = UserCache.put(user_id, row._asdict())
+        unit_of_work.prefetched[user_id] = user_state
+        return user_state
 
-        self._connection = None
-        self._cursor = None
+    def _keyset_page(
+        self,
+        table: str,
+        columns: tuple[str, ...],
+        conditions: dict[str, Any],
+        direction: str,
+        boundary: int,
+        per_page: int
+    ) -> tuple[list[Record, ...], bool, bool]:
+        if direction == "from" and not boundary:
+            direction = "first"
+
+        # Rows are compared together with the equality columns,
+        # so the seek is a single range scan of the index.
+        position_columns = sql.SQL(", ").join(
+            map(sql.Identifier, (*conditions, "name", "id"))
+        )
+        position = sql.SQL("({})").format(position_columns)
+        where = sql.SQL(" AND ").join(
+            sql.SQL("{}=%s").format(sql.Identifier(column))
+            for column in conditions
+        )
+        values = tuple(conditions.values())
+
+        seek = sql.SQL("")
+        seek_values = ()
+        if direction in ("from", "after", "before"):
+            seek = sql.SQL(
+                " AND {} {} (SELECT {} FROM {} WHERE id=%s AND {})"
+            ).format(
+                position,
+                sql.SQL(KEYSET_DIRECTIONS[direction]),
+                position_columns,
+                sql.Identifier(table),
+                where
+            )
+            seek_values = (boundary, *values)
 
-    def __enter__(self) -> Update:
-        self._connection = psycopg2.connect(
-            POSTGRESQL_DATABASE_URL, sslmode='require'
+        order = sql.SQL("DESC" if direction in ("before", "last") else "ASC")
+        self._cursor.execute(
+            sql.SQL(
+                "SELECT {} FROM {} WHERE {}{} "
+                "ORDER BY name {}, id {} LIMIT %s;"
+            ).format(
+                sql.SQL(", ").join(map(sql.Identifier, columns)),
+                sql.Identifier(table),
+                where,
+                seek,
+                order,
+                order
+            ), (*values, *seek_values, per_page)
         )
-        self._cursor = self._connection.cursor()
 
-        return self
+        record_type = _record_type(columns)
+        rows = [record_type(*row) for row in self._cursor.fetchall()]
+        if direction in ("before", "last"):
+            rows.reverse()
 
-    def __exit__(self,
-        exc_type: Optional[Type[BaseException]],
-        exc_value: Optional[BaseException],
-        traceback: Optional[TracebackType]
-    ) -> None:
-        if traceback is None:
-            self._connection.commit()
-        else:
-            self._connection.rollback()
+        if not rows:
+            if direction == "first":
+                return rows, False, False
 
-        self._cursor.close()
-        self._connection.close()
+            # The boundary row is gone, start from the beginning.
+            return self._keyset_page(
+                table, columns, conditions, "first", 0, per_page
+            )
+
+        placeholders = sql.SQL(", ").join([sql.Placeholder()] * len(values))
+        self._cursor.execute(
+            sql.SQL(
+                """SELECT
+                       EXISTS (SELECT 1 FROM {} WHERE {}
+                               AND {} < ({}, %s, %s)),
+                       EXISTS (SELECT 1 FROM {} WHERE {}
+                               AND {} > ({}, %s, %s));
+                """
+            ).format(
+                sql.Identifier(table), where, position, placeholders,
+                sql.Identifier(table), where, position, placeholders
+            ), (*values, *values, rows[0].name, rows[0].id,
+                *values, *values, rows[-1].name, rows[-1].id)
+        )
 
+        has_previous, has_next = self._cursor.fetchone()
+        return rows, has_previous, has_next
+
+    def _row(
+        self,
+        table: str,
+        columns: tuple[str, ...],
+        conditions: dict[str, Any],
+        for_update: Optional[bool] = False
+    ) -> Union[Record, None]:
+        self._cursor.execute(
+            sql.SQL("SELECT {} FROM {} WHERE {}{};").format(
+                sql.SQL(", ").join(map(sql.Identifier, columns)),
+                sql.Identifier(table),
+                sql.SQL(" AND ").join(
+                    sql.SQL("{}=%s").format(sql.Identifier(column))
+                    for column in conditions
+                ),
+                sql.SQL(" FOR UPDATE" if for_update else "")
+            ), tuple(conditions.values())
+        )
+
+        row = self._cursor.fetchone()
+        if row:
+            return _record_type(columns)(*row)
+        return None
+
+
+class Update(Database):
+    """Class responsible for updating data in the database.
+
+    Attributes:
+        db_name: Name of the database to connect to.
+    """
     def user_attribute(
         self,
         user_id: int,
@@ -560,6 +1768,7 @@ class Update:
                 "UPDATE users SET {}=%s WHERE user_id=%s;"
             ).format(sql.Identifier(attribute)), (value, user_id)
         )
+        self._stage_user(user_id, attribute, value)
 
     def collection_attribute(
         self,
@@ -583,6 +1792,125 @@ class Update:
             ).format(sql.Identifier(attribute)), (value, user_id, key)
         )
 
+    def user_counter(
+        self,
+        user_id: int,
+        attribute: str,
+        delta: int
+    ) -> Union[int, None]:
+        """Change a user counter in place.
+
+        Note:
+            The counter is incremented by the update statement itself,
+            so concurrent changes are never lost, and it never goes
+            below zero.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            attribute: The name of the counter, e.g. "cards".
+            delta: Value added to the counter.
+
+        Returns:
+            value: New counter value if the user exists, None otherwise.
+        """
+        self._cursor.execute(
+            sql.SQL(
+                """UPDATE users SET {0}=greatest({0} + %s, 0)
+                   WHERE user_id=%s
+                   RETURNING {0};
+                """).format(sql.Identifier(attribute)), (delta, user_id)
+        )
+        row = self._cursor.fetchone()
+
+        if row:
+            self._stage_user(user_id, attribute, row[0])
+        return row[0] if row else None
+
+    def collection_counter(
+        self,
+        user_id: int,
+        key: str,
+        attribute: str,
+        delta: int
+    ) -> Union[int, None]:
+        """Change a collection counter in place.
+
+        Note:
+            The counter is incremented by the update statement itself,
+            so concurrent changes are never lost, and it never goes
+            below zero.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            attribute: The name of the counter, e.g. "cards".
+            delta: Value added to the counter.
+
+        Returns:
+            value: New counter value if the collection exists,
+                   None otherwise.
+        """
+        self._cursor.execute(
+            sql.SQL(
+                """UPDATE collections SET {0}=greatest({0} + %s, 0)
+                   WHERE user_id=%s AND key=%s
+                   RETURNING {0};
+                """).format(sql.Identifier(attribute)),
+            (delta, user_id, key)
+        )
+        row = self._cursor.fetchone()
+        return row[0] if row else None
+
+    def counters(self) -> int:
+        """Recompute all collection and card counters from the rows
+        they count.
+
+        Returns:
+            repaired: Number of users and collections whose counters
+                      were wrong.
+        """
+        self._cursor.execute(
+            """UPDATE collections AS target
+               SET cards=coalesce(counted.cards, 0)
+               FROM collections AS source
+               LEFT JOIN (SELECT user_id, key, count(*) AS cards
+                          FROM user_cards
+                          GROUP BY user_id, key) AS counted
+                      ON counted.user_id=source.user_id AND
+                         counted.key=source.key
+               WHERE target.id=source.id AND
+                     target.cards IS DISTINCT FROM
+                     coalesce(counted.cards, 0);
+            """
+        )
+        repaired = self._cursor.rowcount
+
+        self._cursor.execute(
+            """UPDATE users AS target
+               SET collections=coalesce(collections.number, 0),
+                   cards=coalesce(cards.number, 0)
+               FROM users AS source
+               LEFT JOIN (SELECT user_id, count(*) AS number
+                          FROM collections
+                          GROUP BY user_id) AS collections
+                      ON collections.user_id=source.user_id
+               LEFT JOIN (SELECT user_id, count(*) AS number
+                          FROM user_cards
+                          GROUP BY user_id) AS cards
+                      ON cards.user_id=source.user_id
+               WHERE target.id=source.id AND
+                     (target.collections, target.cards) IS DISTINCT FROM
+                     (coalesce(collections.number, 0),
+                      coalesce(cards.number, 0))
+               RETURNING target.user_id, target.collections, target.cards;
+            """
+        )
+        users = self._cursor.fetchall()
+        for user_id, collections, cards in users:
+            self._stage_user(user_id, "collections", collections)
+            self._stage_user(user_id, "cards", cards)
+        return repaired + len(users)
+
     def card_attribute(
         self,
         user_id: int,
@@ -593,6 +1921,10 @@ class Update:
     ) -> None:
         """Update card attribute value.
 
+        Note:
+            A shared card becomes a card of the user first. Copies of
+            the collection keep showing its current content.
+
         Args:
             user_id: Unique identifier of the target user.
             key: Unique identifier for the collection.
@@ -601,6 +1933,10 @@ class Update:
                        value you want to update.
             value: New attribute value.
         """
+        self._materialize_cards(
+            "shared.user_id=%s AND shared.key=%s AND shared.card_key=%s",
+            (user_id, key, card_key)
+        )
         self._cursor.execute(
             sql.SQL(
                 """UPDATE cards SET {}=%s
@@ -611,47 +1947,124 @@ class Update:
             (value, user_id,key, card_key)
         )
 
+    def card_review(
+        self,
+        user_id: int,
+        key: str,
+        card_key: str,
+        repetition: int,
+        difficulty: int,
+        next_repetition_date: int,
+        easy_factor: float
+    ) -> Union[Record, None]:
+        """Apply the result of a card review with a single statement.
+
+        Note:
+            The card is only updated if its number of repetitions still
+            equals `repetition`, the value the new state was calculated
+            from. Otherwise another review got there first and nothing
+            is changed.
 
-class Delete:
-    """Class responsible for deleting data from the database.
-
-    Attributes:
-        db_name: Name of the database to connect to.
-    """
-    def __init__(self, db_name: str) -> None:
-        self._db_name = db_name
-
-        self._connection = None
-        self._cursor = None
+        Args:
+            user_id: Unique identifier of the target user.
+            key: Unique identifier for the collection.
+            card_key: Unique identifier for the card.
+            repetition: Number of repetitions before this review.
+            difficulty: New difficulty of the card.
+            next_repetition_date: Time of the next card review.
+            easy_factor: New easiness factor.
 
-    def __enter__(self) -> Delete:
-        self._connection = psycopg2.connect(
-            POSTGRESQL_DATABASE_URL, sslmode='require'
+        Returns:
+            card: New state of the card if the review was applied,
+                  None otherwise.
+        """
+        columns = (
+            "difficulty", "repetition", "next_repetition_date", "easy_factor"
+        )
+        self._materialize_cards(
+            "shared.user_id=%s AND shared.key=%s AND shared.card_key=%s",
+            (user_id, key, card_key)
+        )
+        self._cursor.execute(
+            """UPDATE cards
+               SET difficulty=%s,
+                   repetition=repetition + 1,
+                   next_repetition_date=%s,
+                   easy_factor=%s
+               WHERE user_id=%s AND
+                     key=%s AND
+                     card_key=%s AND
+                     repetition=%s
+               RETURNING difficulty,
+                         repetition,
+                         next_repetition_date,
+                         easy_factor;
+            """, (difficulty, next_repetition_date, easy_factor,
+                  user_id, key, card_key, repetition)
         )
-        self._cursor = self._connection.cursor()
 
-        return self
+        card = self._cursor.fetchone()
+        if card:
+            return _record_type(columns)(*card)
+        return None
 
-    def __exit__(self,
-        exc_type: Optional[Type[BaseException]],
-        exc_value: Optional[BaseException],
-        traceback: Optional[TracebackType]
-    ) -> None:
-        if traceback is None:
-            self._connection.commit()
-        else:
-            self._connection.rollback()
 
-        self._cursor.close()
-        self._connection.close()
+class Delete(Database):
+    """Class responsible for deleting data from the database.
 
-    def collection(self, user_id: int, key: str) -> None:
+    Attributes:
+        db_name: Name of the database to connect to.
+    """
+    def collection(self, user_id: int, key: str) -> Union[int, None]:
         """Delete user collection.
 
         Args:
             user_id: Unique identifier of the target user.
             key: Unique identifier for the collection.
+
+        Note:
+            Copies of the collection get their own cards first, which
+            costs a row for every card of every copy. Their rows of
+            deleted shared cards are then of no use and are removed.
+
+        Returns:
+            cards: Number of deleted cards of the collection if it was
+                   deleted, None if it did not exist.
         """
+        self._cursor.execute(
+            """SELECT 1 FROM collections
+               WHERE user_id=%s AND
+                     key=%s
+               FOR UPDATE;
+            """, (user_id, key)
+        )
+        if self._cursor.fetchone() is None:
+            return None
+
+        self._materialize_cards("collections.source_key=%s", (key,))
+        self._cursor.execute(
+            """DELETE FROM cards
+               USING collections
+               WHERE cards.user_id=collections.user_id AND
+                     cards.key=collections.key AND
+                     collections.source_key=%s AND
+                     cards.deleted;
+            """, (key,)
+        )
+        self._cursor.execute(
+            """UPDATE collections
+               SET source_key=NULL, source_id=NULL
+               WHERE source_key=%s;
+            """, (key,)
+        )
+        self._cursor.execute(
+            """SELECT count(*) FROM user_cards
+               WHERE user_id=%s AND
+                     key=%s;
+            """, (user_id, key)
+        )
+        cards = self._cursor.fetchone()[0]
+
         self._cursor.execute(
             """DELETE FROM collections
                WHERE user_id=%s AND
@@ -664,19 +2077,66 @@ class Delete:
                      key=%s;
             """, (user_id, key)
         )
+        self._forget_existence()
+        return cards
 
-    def card(self, user_id: int, key: str, card_key: str) -> None:
+    def card(self, user_id: int, key: str, card_key: str) -> bool:
         """Delete user card.
 
         Args:
             user_id: Unique identifier of the target user.
             key: Unique identifier for the collection.
             card_key: Unique identifier for the card.
+
+        Note:
+            Copies of the collection get their own row of the card first.
+            In a copied collection the card is only marked as deleted,
+            which hides the shared card with the same key.
+
+        Returns:
+            True if the card was deleted, False otherwise.
         """
+        self._materialize_cards(
+            "collections.source_key=%s AND shared.card_key=%s",
+            (key, card_key)
+        )
+        self._cursor.execute(
+            """INSERT INTO cards (user_id, key, card_key, deleted)
+               SELECT shared.user_id, shared.key, shared.card_key, true
+               FROM user_cards AS shared
+               JOIN collections
+                 ON collections.user_id=shared.user_id AND
+                    collections.key=shared.key
+               WHERE shared.user_id=%s AND
+                     shared.key=%s AND
+                     shared.card_key=%s AND
+                     collections.source_key IS NOT NULL
+               ON CONFLICT (user_id, key, card_key)
+               DO UPDATE SET deleted=true;
+            """, (user_id, key, card_key)
+        )
+        deleted = self._cursor.rowcount
+
         self._cursor.execute(
             """DELETE FROM cards
                WHERE user_id=%s AND
                      key=%s AND
-                     card_key=%s;
+                     card_key=%s AND
+                     NOT deleted;
             """, (user_id, key, card_key)
         )
+        self._forget_existence()
+        return deleted + self._cursor.rowcount > 0
+
+    def old_updates(self, window: int) -> None:
+        """Delete update identifiers that fell out of the window.
+
+        Args:
+            window: Number of latest update identifiers remembered.
+        """
+        self._cursor.execute(
+            """DELETE FROM updates
+               WHERE update_id <= (SELECT max(update_id) - %s
+                                   FROM updates);
+            """, (window,)
+        )
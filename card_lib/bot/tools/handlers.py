@@ -1,12 +1,31 @@
 """
     Implementation handlers for basic user actions.
 """
-from typing import Any
-
-from ..tools.helpers import Tools
+import logging
+from typing import Any, Union, Optional
+
+from ..tools.helpers import API, Tools, Dispatcher, WebhookReply
+from ..tools.database import UnitOfWork, UserState
+from ..tools.updates import UpdateLog
+from ..tools.shards import ShardPool
+from ..tools.workers import KeyedWorkerPool
+from ..tools.coalescing import EditCoalescer
 from ..template.menu import Menu
 from ..template.card import Card
 from ..template.collection import Collection
+from ..config import UPDATE_WORKERS, UPDATE_QUEUE_SIZE
+from ..config import UPDATE_QUEUE_TIMEOUT, UPDATE_OVERFLOW
+from ..config import UPDATE_DRAIN_TIMEOUT, SHARD_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+# Callback data of buttons that only show a menu and change nothing.
+# Page buttons ("level_", "page_") only move within a list.
+RENDER_CALLBACKS = (
+    "private_office", "settings", "locale_settings", "collections",
+    "info", "edit_collection", "delete_collection", "delete_card",
+    "collection_cards", "collection_learning", "show_answer"
+)
 
 
 class CommandHandler:
@@ -203,3 +222,224 @@ class SessionHandler:
     def _card_handler(self):
         card = Card(message=self.message)
         card.session_handler()
+
+
+class UpdateHandler:
+    """Incoming update handler.
+
+    Note:
+        All database work caused by the update shares one connection
+        and is committed once, after the update has been handled.
+        A callback query that only shows a menu is just answered,
+        without rebuilding the menu, if a newer one for the same message
+        has arrived since. Other callback queries always run, only their
+        final edit is skipped.
+        Redelivered updates are dropped before any handler runs.
+
+    Attributes:
+        update: An object containing all information
+                about the incoming update.
+        prefetched: Attributes of users fetched in advance,
+                    keyed by user identifier. Defaults to None.
+    """
+    def __init__(
+        self,
+        update: dict[str, Any],
+        prefetched: Optional[dict[int, UserState]] = None
+    ) -> None:
+        self.update = update
+        self.prefetched = prefetched
+
+        # Ticket for the message edited by the update.
+        self.ticket = EditCoalescer.register(update)
+
+    def handler(self) -> None:
+        """Handler passes the update to the handler of its type.
+        """
+        update_id = self.update.get("update_id")
+        if not UpdateLog.claim(update_id):
+            return
+
+        tracking = EditCoalescer.tracking(self.ticket)
+        try:
+            with tracking, UnitOfWork(self.prefetched):
+                self._dispatch(update_id)
+        except Exception:
+            UpdateLog.release(update_id)
+            raise
+
+    @staticmethod
+    def user_id(update: dict[str, Any]) -> Union[int, None]:
+        """Get the user who sent the update.
+
+        Args:
+            update: An object containing all information
+                    about the incoming update.
+
+        Returns:
+            user_id: Unique identifier of the user if the update
+                     has one, None otherwise.
+        """
+        if "message" in update:
+            return update["message"]["chat"]["id"]
+
+        if "callback_query" in update:
+            return update["callback_query"]["from"]["id"]
+        return None
+
+    def _dispatch(self, update_id: Union[int, None]) -> None:
+        if not UpdateLog.claim_persisted(update_id):
+            return
+
+        callback_query = self.update.get("callback_query")
+        if (callback_query and UpdateHandler._renders_only(callback_query)
+                and EditCoalescer.is_superseded()):
+            self._skip_callback_query(callback_query)
+
+        elif "message" in self.update:
+            self._message_handler(self.update["message"])
+
+        elif "callback_query" in self.update:
+            self._callback_query_handler(self.update["callback_query"])
+
+    @staticmethod
+    def _renders_only(callback_query: dict[str, Any]) -> bool:
+        session = Tools.define_session(callback_query.get("data", ""))
+        if len(session) < 2:
+            return False
+
+        data = session[1]
+        return (data in RENDER_CALLBACKS or
+                data.startswith(("level_", "page_")))
+
+    @staticmethod
+    def _message_handler(message: dict[str, Any]) -> None:
+        if ("entities" in message and
+                message["entities"][0]["type"] == "bot_command"):
+            command_handler = CommandHandler(message)
+            command_handler.handler()
+        else:
+            session_handler = SessionHandler(message)
+            session_handler.handler()
+
+    @staticmethod
+    def _callback_query_handler(callback_query: dict[str, Any]) -> None:
+        callback_query_handler = CallbackQueryHandler(callback_query)
+        callback_query_handler.handler()
+
+    @staticmethod
+    def _skip_callback_query(callback_query: dict[str, Any]) -> None:
+        API.answer_callback_query(callback_query_id=callback_query["id"])
+
+
+def _handle_update(update_handler: UpdateHandler) -> None:
+    update_handler.handler()
+
+
+def _stop_shard() -> None:
+    Dispatcher.stop()
+
+
+class UpdateQueue:
+    """Background processing of incoming updates.
+
+    Note:
+        Updates of one user are handled by the same worker in the order
+        they arrived, so session transitions stay consistent. Workers
+        are threads of the current process, or separate processes if
+        `SHARD_PROCESSES` is set.
+    """
+    if SHARD_PROCESSES:
+        _pool = ShardPool(
+            name="update-shard",
+            handler=_handle_update,
+            finalizer=_stop_shard,
+            processes=SHARD_PROCESSES,
+            capacity=UPDATE_QUEUE_SIZE,
+            drain_timeout=UPDATE_DRAIN_TIMEOUT
+        )
+    else:
+        _pool = KeyedWorkerPool(
+            name="update-worker",
+            handler=_handle_update,
+            workers=max(UPDATE_WORKERS, 1),
+            capacity=UPDATE_QUEUE_SIZE,
+            drain_timeout=UPDATE_DRAIN_TIMEOUT
+        )
+
+    # Number of updates discarded because of the "drop" overflow policy.
+    dropped = 0
+
+    @staticmethod
+    def enqueue(update: dict[str, Any]) -> bool:
+        """Queue an update for processing.
+
+        Args:
+            update: An object containing all information
+                    about the incoming update.
+
+        Returns:
+            True if the update was accepted, False if Telegram
+            has to deliver it again later.
+        """
+        if UPDATE_OVERFLOW == "block":
+            timeout = UPDATE_QUEUE_TIMEOUT
+        else:
+            timeout = 0
+
+        update_handler = UpdateHandler(update)
+        is_queued = UpdateQueue._pool.submit(
+            key=UpdateHandler.user_id(update),
+            item=update_handler,
+            timeout=timeout
+        )
+
+        if not is_queued and UPDATE_OVERFLOW == "drop":
+            UpdateQueue.dropped += 1
+            logger.warning("Update %s was dropped", update.get("update_id"))
+            return True
+        return is_queued
+
+    @staticmethod
+    def metrics() -> dict[str, Any]:
+        """Get update queue metrics.
+
+        Returns:
+            metrics: Queue depth of every worker and update counters.
+        """
+        return {**UpdateQueue._pool.metrics(), "dropped": UpdateQueue.dropped}
+
+    @staticmethod
+    def stop() -> None:
+        """Handle all queued updates and stop the workers.
+        """
+        UpdateQueue._pool.stop()
+        Dispatcher.stop()
+
+
+class Webhook:
+    """Handling of updates received by the webhook.
+    """
+    @staticmethod
+    def receive(update: Any) -> tuple[dict[str, Any], int]:
+        """Handle an update, or queue it if background processing is on.
+
+        Args:
+            update: Decoded body of the webhook request.
+
+        Returns:
+            response: Body and status code of the webhook response.
+        """
+        if UPDATE_WORKERS or SHARD_PROCESSES:
+            if not isinstance(update, dict) or "update_id" not in update:
+                return {"ok": False}, 400
+
+            if not UpdateQueue.enqueue(update):
+                return {"ok": False}, 503
+            return {"ok": True}, 200
+
+        with WebhookReply() as reply:
+            update_handler = UpdateHandler(update)
+            update_handler.handler()
+
+        return reply.payload() or update, 200
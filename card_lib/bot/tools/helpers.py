@@ -1,18 +1,50 @@
 """
     Implementation of tools to help the bot work.
 """
+from __future__ import annotations
+import os
 import re
+import json
 import random
+import inspect
+import logging
+import threading
 import string
+import tempfile
 from math import ceil
-from typing import Any, Union, Optional, Callable
+from typing import IO, Any, Type, Union, Optional, Callable, Iterator
+from types import TracebackType
 from datetime import datetime
+from contextvars import ContextVar
 import requests
-
-from ..tools.database import Select, Insert, Update
-from ..config import TELEGRAM_TOKEN, TELEGRAM_URL
-from ..config import USERS_DATABASE, COLLECTIONS_DATABASE, MESSAGES_DATABASE
-
+from requests.adapters import HTTPAdapter
+
+from ..tools.database import Select, Insert, Update, Record, KEYSET_DIRECTIONS
+from ..tools.database import UnitOfWork
+from ..tools.catalog import MessageCatalog
+from ..tools.workers import KeyedWorkerPool
+from ..tools.ratelimit import RateLimiter
+from ..tools.coalescing import EditCoalescer
+from ..config import TELEGRAM_TOKEN, TELEGRAM_URL, TELEGRAM_POOL_SIZE
+from ..config import TELEGRAM_FILE_URL
+from ..config import TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT
+from ..config import WEBHOOK_REPLY, OUTBOUND_WORKERS, OUTBOUND_QUEUE_SIZE
+from ..config import OUTBOUND_QUEUE_TIMEOUT, OUTBOUND_DRAIN_TIMEOUT
+from ..config import TELEGRAM_RATE, TELEGRAM_BURST, TELEGRAM_MAX_WAIT
+from ..config import TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST
+from ..config import TELEGRAM_MAX_RETRIES, TELEGRAM_PROCESSES
+from ..config import USERS_DATABASE, COLLECTIONS_DATABASE
+
+logger = logging.getLogger(__name__)
+
+# Bytes of a downloaded file written at once.
+DOWNLOAD_CHUNK_SIZE = 65536
+
+# Telegram API methods that are limited per chat.
+CHAT_METHODS = ("sendMessage", "editMessageText")
+
+# Webhook reply of the update that is currently being processed.
+_current_webhook_reply = ContextVar("current_webhook_reply", default=None)
 
 # Variable defining the type of button template.
 ButtonTemplate = list[str, str]
@@ -52,7 +84,8 @@ class Bot:
                 text=self.text,
                 keyboard=keyboard,
                 parse_mode=self.parse_mode,
-                disable_web_page_preview=self.disable_web_page_preview
+                disable_web_page_preview=self.disable_web_page_preview,
+                webhook_reply=True
             )
         return _send_message
 
@@ -78,7 +111,8 @@ class Bot:
                 message_id=self.message_id,
                 text=self.title,
                 keyboard=keyboard,
-                parse_mode=self.parse_mode
+                parse_mode=self.parse_mode,
+                webhook_reply=True
             )
         return _edit_message
 
@@ -105,14 +139,173 @@ class Bot:
 
 class API:
     """Working with the Telegram API.
+
+    Note:
+        All requests of a process go through one HTTP session, so
+        connections to the Telegram API are kept alive and reused.
     """
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+    limiter = RateLimiter(
+        rate=TELEGRAM_RATE/TELEGRAM_PROCESSES,
+        burst=max(TELEGRAM_BURST/TELEGRAM_PROCESSES, 1),
+        chat_rate=TELEGRAM_CHAT_RATE,
+        chat_burst=TELEGRAM_CHAT_BURST,
+        max_wait=TELEGRAM_MAX_WAIT
+    )
+
+    @staticmethod
+    def session() -> requests.Session:
+        """Get the HTTP session of the current process.
+
+        Returns:
+            session: Session with a pool of keep-alive connections.
+        """
+        pid = os.getpid()
+        if API._session is None or API._session_pid != pid:
+            with API._session_lock:
+                if API._session is None or API._session_pid != pid:
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=TELEGRAM_POOL_SIZE
+                    )
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+
+                    API._session = session
+                    API._session_pid = pid
+        return API._session
+
+    @staticmethod
+    def request(
+        method: str,
+        body: dict[str, Any],
+        webhook_reply: Optional[bool] = False
+    ) -> Union[dict[str, Any], None]:
+        """Call a Telegram API method.
+
+        Note:
+            Inside a unit of work the call is made once its transaction
+            is committed, and not at all if it is rolled back.
+
+        Args:
+            method: Name of the Telegram API method.
+            body: Parameters of the method.
+            webhook_reply: Allow passing the call in the response to
+                           the webhook instead of sending a request.
+                           Defaults to False.
+
+        Returns:
+            response: Decoded Telegram response if the request was
+                      completed right away, None if it was deferred or
+                      failed.
+        """
+        unit_of_work = UnitOfWork.current()
+        if unit_of_work:
+            unit_of_work.after_commit(
+                lambda: API._request(method, body, webhook_reply)
+            )
+            return None
+        return API._request(method, body, webhook_reply)
+
+    @staticmethod
+    def _request(
+        method: str,
+        body: dict[str, Any],
+        webhook_reply: bool
+    ) -> Union[dict[str, Any], None]:
+        reply = WebhookReply.current()
+        if webhook_reply and reply and WEBHOOK_REPLY:
+            reply.hold(method, body)
+            return None
+
+        if OUTBOUND_WORKERS and Dispatcher.enqueue(method, body):
+            return None
+
+        return API.post(method, body)
+
+    @staticmethod
+    def post(
+        method: str,
+        body: dict[str, Any],
+        read_timeout: Optional[float] = None
+    ) -> Union[dict[str, Any], None]:
+        """Send a request to the Telegram API and wait for the response.
+
+        Args:
+            method: Name of the Telegram API method.
+            body: Parameters of the method.
+            read_timeout: Seconds to wait for the response.
+                          Defaults to None, `TELEGRAM_READ_TIMEOUT`.
+
+        Note:
+            Calls pass through the rate limiter first. Calls rejected
+            with 429 are retried after the time Telegram asked for.
+            A call made while a webhook request is being answered waits
+            for the limiter in the request thread, unless `API.request`
+            has handed it to the `Dispatcher` queue.
+
+        Returns:
+            response: Decoded Telegram response if the request
+                      was completed, None otherwise.
+        """
+        response = API._post(method, body, read_timeout)
+
+        if method == "editMessageText" and (response or {}).get("ok"):
+            EditCoalescer.confirm(
+                chat_id=body["chat_id"],
+                message_id=body["message_id"],
+                text=body["text"],
+                markup=body.get("reply_markup")
+            )
+        return response
+
+    @staticmethod
+    def _post(
+        method: str,
+        body: dict[str, Any],
+        read_timeout: Optional[float] = None
+    ) -> Union[dict[str, Any], None]:
+        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, method)
+        chat_id = body.get("chat_id") if method in CHAT_METHODS else None
+        timeout = (
+            TELEGRAM_CONNECT_TIMEOUT,
+            read_timeout or TELEGRAM_READ_TIMEOUT
+        )
+
+        for _ in range(TELEGRAM_MAX_RETRIES + 1):
+            if not API.limiter.acquire(chat_id):
+                logger.warning("Telegram method %s was dropped", method)
+                return None
+
+            try:
+                response = API.session().post(
+                    url,
+                    json=body,
+                    timeout=timeout
+                ).json()
+            except (requests.RequestException, ValueError) as error:
+                logger.warning("Telegram method %s failed: %s", method, error)
+                return None
+
+            if response.get("error_code") != 429:
+                return response
+
+            parameters = response.get("parameters", {})
+            API.limiter.retry_after(parameters.get("retry_after", 1), chat_id)
+
+        return response
+
     @staticmethod
     def send_message(
         chat_id: int,
         text: str,
         keyboard: Optional[dict[str, Any]] = None,
         parse_mode: Optional[str] = None,
-        disable_web_page_preview: Optional[bool] = False
+        disable_web_page_preview: Optional[bool] = False,
+        webhook_reply: Optional[bool] = False
     ) -> None:
         """Send a text message with additional options.
 
@@ -125,8 +318,9 @@ class API:
                         Defaults to None.
             disable_web_page_preview: Disables link previews
                                       for links in this message.
+            webhook_reply: Allow sending the message in the response
+                           to the webhook. Defaults to False.
         """
-        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, "sendMessage")
         body = {"chat_id": chat_id, "text": text}
 
         if parse_mode:
@@ -138,7 +332,7 @@ class API:
         if keyboard:
             body = {**body, **keyboard}
 
-        requests.post(url, json=body)
+        API.request("sendMessage", body, webhook_reply)
 
     @staticmethod
     def edit_message(
@@ -146,7 +340,8 @@ class API:
         message_id: int,
         text: str,
         keyboard: Optional[dict[str, Any]] = None,
-        parse_mode: Optional[str] = None
+        parse_mode: Optional[str] = None,
+        webhook_reply: Optional[bool] = False
     ) -> None:
         """Edit bot message, to change the message text or the current menu.
 
@@ -158,8 +353,12 @@ class API:
                       Defaults to None.
             parse_mode: Mode for parsing entities in the message text.
                         Defaults to None.
+            webhook_reply: Allow editing the message in the response
+                           to the webhook. Defaults to False.
         """
-        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, "editMessageText")
+        if EditCoalescer.is_superseded(chat_id, message_id):
+            return
+
         body = {"chat_id": chat_id, "message_id": message_id, "text": text}
 
         if parse_mode:
@@ -168,7 +367,14 @@ class API:
         if keyboard:
             body = {**body, **keyboard}
 
-        requests.post(url, json=body)
+        markup = body.get("reply_markup")
+        if not EditCoalescer.is_modified(chat_id, message_id, text, markup):
+            return
+
+        # The content is remembered again once Telegram confirms it,
+        # which never happens for an edit in the webhook response.
+        EditCoalescer.forget(chat_id, message_id)
+        API.request("editMessageText", body, webhook_reply)
 
     @staticmethod
     def answer_callback_query(
@@ -185,33 +391,323 @@ class API:
             show_alert: If true, then show a notification with text.
                         Defaults to False.
         """
-        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, "answerCallbackQuery")
         body = {"callback_query_id": callback_query_id}
 
         if text:
             body["text"] = text
             body["show_alert"] = show_alert
 
-        requests.post(url, json=body)
+        API.request("answerCallbackQuery", body)
+
+    @staticmethod
+    def download(file_id: str) -> Union[IO[bytes], None]:
+        """Download a file sent to the bot.
+
+        Note:
+            The file is written to a temporary file that is removed
+            when it is closed. It has to be closed by the caller.
+
+        Args:
+            file_id: Identifier of the file.
+
+        Returns:
+            file: Temporary file positioned at its start if the file
+                  was downloaded, None otherwise.
+        """
+        response = API.post("getFile", {"file_id": file_id})
+        if not response or not response.get("ok"):
+            logger.warning("Telegram method getFile failed: %s", response)
+            return None
+
+        url = TELEGRAM_FILE_URL.format(
+            TELEGRAM_TOKEN, response["result"]["file_path"]
+        )
+        file = tempfile.TemporaryFile()
+        try:
+            with API.session().get(
+                url,
+                stream=True,
+                timeout=(TELEGRAM_CONNECT_TIMEOUT, TELEGRAM_READ_TIMEOUT)
+            ) as download:
+                download.raise_for_status()
+                for chunk in download.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
+        except requests.RequestException as error:
+            logger.warning("File download failed: %s", error)
+            file.close()
+            return None
+
+        file.seek(0)
+        return file
 
     @staticmethod
     def inline_keyboard(menu_template: MenuTemplate) -> dict[str, Any]:
         """Create an inline keyboard wrapper.
 
+        Note:
+            The keyboard is passed to Telegram as a JSON-serialized
+            string, so menus compiled by `Keyboard.compiled` are sent
+            without being serialized again.
+
         Args:
             menu_template: Button of an inline keyboard.
 
         Returns:
             keyboard: Inline keyboard wrapper.
         """
-        keyboard = {
-            "reply_markup": {
-                "inline_keyboard": [
-                ]
-            }
+        markup = getattr(menu_template, "markup", None)
+        if markup is None:
+            markup = Keyboard.markup(menu_template)
+
+        keyboard = {"reply_markup": markup}
+        return keyboard
+
+
+class Dispatcher:
+    """Background delivery of outbound Telegram API calls.
+
+    Note:
+        Calls are delivered by `OUTBOUND_WORKERS` threads. Calls to the
+        same chat always go through the same thread, so they reach
+        Telegram in the order they were made. When the queue is full, the
+        caller waits up to `OUTBOUND_QUEUE_TIMEOUT` seconds and then
+        makes the call itself.
+    """
+    _pool = KeyedWorkerPool(
+        name="telegram-dispatcher",
+        handler=lambda call: Dispatcher._deliver(call),
+        workers=max(OUTBOUND_WORKERS, 1),
+        capacity=OUTBOUND_QUEUE_SIZE,
+        drain_timeout=OUTBOUND_DRAIN_TIMEOUT
+    )
+
+    # Latest queued edit of every message, keyed by chat and message.
+    _pending_edits = {}
+    _pending_lock = threading.Lock()
+
+    # Number of edits skipped because a newer edit was queued.
+    coalesced = 0
+
+    @staticmethod
+    def enqueue(method: str, body: dict[str, Any]) -> bool:
+        """Queue a Telegram API call for delivery.
+
+        Note:
+            A queued `editMessageText` is skipped if a newer edit of
+            the same message is queued after it.
+
+        Args:
+            method: Name of the Telegram API method.
+            body: Parameters of the method.
+
+        Returns:
+            True if the call was queued, False otherwise.
+        """
+        call = (method, body)
+        message = Dispatcher._edited_message(call)
+        if message:
+            with Dispatcher._pending_lock:
+                Dispatcher._pending_edits[message] = call
+
+        key = body.get("chat_id", body.get("callback_query_id"))
+        is_queued = Dispatcher._pool.submit(
+            key=key,
+            item=call,
+            timeout=OUTBOUND_QUEUE_TIMEOUT
+        )
+
+        if message and not is_queued:
+            with Dispatcher._pending_lock:
+                if Dispatcher._pending_edits.get(message) is call:
+                    del Dispatcher._pending_edits[message]
+        return is_queued
+
+    @staticmethod
+    def metrics() -> dict[str, Any]:
+        """Get outbound queue metrics.
+
+        Returns:
+            metrics: Queue depth of every worker, call counters,
+                     rate limiter and edit coalescing counters.
+        """
+        return {
+            **Dispatcher._pool.metrics(),
+            **API.limiter.metrics(),
+            **EditCoalescer.metrics(),
+            "coalesced": Dispatcher.coalesced
         }
 
-        inline_keyboard = keyboard["reply_markup"]["inline_keyboard"]
+    @staticmethod
+    def stop() -> None:
+        """Deliver all queued calls and stop the workers.
+        """
+        Dispatcher._pool.stop()
+
+    @staticmethod
+    def _deliver(call: tuple[str, dict[str, Any]]) -> None:
+        message = Dispatcher._edited_message(call)
+        if message:
+            with Dispatcher._pending_lock:
+                if Dispatcher._pending_edits.get(message) is not call:
+                    Dispatcher.coalesced += 1
+                    return
+                del Dispatcher._pending_edits[message]
+
+        API.post(*call)
+
+    @staticmethod
+    def _edited_message(
+        call: tuple[str, dict[str, Any]]
+    ) -> Union[tuple[int, int], None]:
+        method, body = call
+        if method == "editMessageText":
+            return body["chat_id"], body["message_id"]
+        return None
+
+
+class WebhookReply:
+    """Telegram method call returned in the response to the webhook.
+
+    Note:
+        Telegram executes a method passed in the body of the webhook
+        response, which saves an outbound request. Only the most recent
+        eligible call is held for the response, an earlier one is sent
+        as soon as a newer one replaces it, so their order is kept.
+    """
+    def __init__(self) -> None:
+        self.method = None
+        self.body = None
+
+        self._token = None
+
+    def __enter__(self) -> WebhookReply:
+        self._token = _current_webhook_reply.set(self)
+        return self
+
+    def __exit__(self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType]
+    ) -> None:
+        _current_webhook_reply.reset(self._token)
+
+        # Nothing will be returned to Telegram, so the held call is sent.
+        if traceback is not None and self.method:
+            API.request(self.method, self.body)
+            self.method = self.body = None
+
+    @staticmethod
+    def current() -> Union[WebhookReply, None]:
+        """Get the webhook reply of the update being processed.
+
+        Returns:
+            reply: Webhook reply if one is active, None otherwise.
+        """
+        return _current_webhook_reply.get()
+
+    def hold(self, method: str, body: dict[str, Any]) -> None:
+        """Hold a method call for the webhook response.
+
+        Args:
+            method: Name of the Telegram API method.
+            body: Parameters of the method.
+        """
+        if self.method:
+            API.request(self.method, self.body)
+
+        self.method = method
+        self.body = body
+
+    def payload(self) -> Union[dict[str, Any], None]:
+        """Get the body of the webhook response.
+
+        Returns:
+            payload: Held method call if there is one, None otherwise.
+        """
+        if self.method:
+            return {"method": self.method, **self.body}
+        return None
+
+
+class CompiledMenu(list):
+    """Menu template with a ready-to-send inline keyboard.
+
+    Attributes:
+        markup: JSON-serialized inline keyboard of the menu.
+        version: Version of the bot messages the menu was built with.
+    """
+    __slots__ = ("markup", "version")
+
+
+class Keyboard:
+    """Compilation of menu templates into inline keyboards.
+    """
+    @staticmethod
+    def compiled(func: Callable) -> Callable:
+        """Decorator that builds a menu template once per locale.
+
+        Note:
+            The locale must be the first argument of the template. All
+            other arguments may only be used in the callback data of
+            buttons: the template is built once with placeholders in
+            their place, and the placeholders are substituted on each
+            call. Compiled menus are rebuilt when the bot messages change.
+        """
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)[1:]
+        placeholders = [f"\x1f{name}\x1f" for name in parameters]
+        encoded_placeholders = [
+            json.dumps(placeholder)[1:-1] for placeholder in placeholders
+        ]
+        skeletons = {}
+
+        def _compiled(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            locale = arguments.get("locale")
+            version = MessageCatalog.version()
+
+            skeleton = skeletons.get(locale)
+            if skeleton is None or skeleton.version != version:
+                skeleton = CompiledMenu(func(locale, *placeholders))
+                skeleton.markup = Keyboard.markup(skeleton)
+                skeleton.version = version
+                skeletons[locale] = skeleton
+
+            if not parameters:
+                return skeleton
+
+            values = [str(arguments[name]) for name in parameters]
+
+            menu = CompiledMenu(
+                [
+                    [
+                        [text, Keyboard._substitute(
+                            data, placeholders, values
+                        )]
+                        for text, data in layer
+                    ]
+                    for layer in skeleton
+                ]
+            )
+            menu.markup = Keyboard._substitute(
+                skeleton.markup,
+                encoded_placeholders,
+                [json.dumps(value)[1:-1] for value in values]
+            )
+            return menu
+        return _compiled
+
+    @staticmethod
+    def markup(menu_template: MenuTemplate) -> str:
+        """Serialize a menu template into an inline keyboard.
+
+        Args:
+            menu_template: Button of an inline keyboard.
+
+        Returns:
+            markup: JSON-serialized inline keyboard.
+        """
+        inline_keyboard = []
         for index, button_data in enumerate(menu_template):
             inline_keyboard.append([])
 
@@ -219,7 +715,18 @@ class API:
                 button = {"text": button_text, "callback_data": callback_data}
                 inline_keyboard[index].append(button)
 
-        return keyboard
+        markup = json.dumps({"inline_keyboard": inline_keyboard})
+        return markup
+
+    @staticmethod
+    def _substitute(
+        text: str,
+        placeholders: list[str],
+        values: list[str]
+    ) -> str:
+        for placeholder, value in zip(placeholders, values):
+            text = text.replace(placeholder, value)
+        return text
 
 
 class Tools:
@@ -317,8 +824,7 @@ class Tools:
         Returns:
             template: Identified button template.
         """
-        with Select(MESSAGES_DATABASE) as select:
-            identified_name = select.bot_message(name, locale)
+        identified_name = MessageCatalog.message(name, locale)
 
         template = [f"{identified_name}", f"{header}/{data}"]
         return template
@@ -406,6 +912,23 @@ class Tools:
         card_key = f"K-{hex_part}-{string_part}-CR"
         return card_key
 
+    @staticmethod
+    def card_keys() -> Iterator[str]:
+        """Generate distinct card keys for many cards created at once.
+
+        Returns:
+            card_keys: Endless iterator of unique identifiers for cards.
+        """
+        hex_part = hex(
+            int(datetime.now().timestamp())*random.randrange(10, 20)
+        )[2:]
+        string_part = "".join(random.choices(string.ascii_letters, k=3))
+
+        number = 0
+        while True:
+            yield f"K-{hex_part}-{number:x}{string_part}-CR"
+            number += 1
+
     @staticmethod
     def collection_search(key: str) -> bool:
         """Check the existence of a collection without binding to the user.
@@ -432,8 +955,8 @@ class Tools:
             True for success, False otherwise.
         """
         with Select(COLLECTIONS_DATABASE) as select:
-            is_exists = select.collection_attribute(user_id, key, "name")
-        return bool(is_exists)
+            collection_exists, _ = select.existence(user_id, key)
+        return collection_exists
 
     @staticmethod
     def check_card_existence(user_id: int, key: str, card_key: int) -> bool:
@@ -448,8 +971,8 @@ class Tools:
             True for success, False otherwise.
         """
         with Select(COLLECTIONS_DATABASE) as select:
-            is_exists = select.card_attribute(user_id, key, card_key, "name")
-        return bool(is_exists)
+            _, card_exists = select.existence(user_id, key, card_key)
+        return card_exists
 
     @staticmethod
     def text_appearance(text: str) -> str:
@@ -477,7 +1000,7 @@ class Tools:
         obj: str,
         header: str,
         data: str,
-        list_of_items: list[Any],
+        list_of_items: list[Record, ...],
         buttons_in_layer: Optional[int] = 2
     ) -> LayerTemplate:
         """Create a list of buttons for specific items.
@@ -486,8 +1009,9 @@ class Tools:
             obj: Session identifier for creating a list of buttons.
             header: The section the button belongs to.
             data: Data associated with the callback button.
-            list_of_items: List of items from which to create a
-                           list of buttons.
+            list_of_items: Records of the items from which to create
+                           a list of buttons, with `key` and `name`
+                           fields, and `card_key` for cards.
             buttons_in_layer: Variable responsible for the number of
                               buttons in one layer. Defaults to 2.
 
@@ -504,12 +1028,10 @@ class Tools:
             right_border = buttons_in_layer*(layer+1)
 
             for item in list_of_items[left_border:right_border]:
-                button_data = f"{header}/{data}/{item[2]}"
-                if obj == "collection":
-                    button_name = item[3]
-                else: # obj == "card"
-                    button_name = item[4]
-                    button_data += f"/{item[3]}"
+                button_data = f"{header}/{data}/{item.key}"
+                if obj == "card":
+                    button_data += f"/{item.card_key}"
+                button_name = item.name
 
                 buttons[layer].append([button_name, button_data])
 
@@ -753,6 +1275,91 @@ class Tools:
 
         return buttons
 
+    @staticmethod
+    def define_page(data: str) -> tuple[str, int]:
+        """Get the direction and the boundary of a keyset page.
+
+        Args:
+            data: Page data of the callback button, e.g. "page_after_42".
+
+        Returns:
+            page: Page direction and identifier of the boundary item,
+                  0 if the direction has no boundary.
+        """
+        _, direction, *boundary = data.split("_")
+        if direction not in KEYSET_DIRECTIONS or direction == "from":
+            return "first", 0
+        return direction, int(boundary[0]) if boundary else 0
+
+    @staticmethod
+    def page_offset(page_level: Union[int, None]) -> int:
+        """Get the page number stored in a page level.
+
+        Note:
+            Offset pagination stores page numbers, which are never
+            negative, and keyset pagination stores the identifier of
+            the first item of the page negated. A value stored with the
+            other kind of pagination means the first page.
+
+        Args:
+            page_level: Stored page level.
+
+        Returns:
+            offset: Number of the page, 0 for the first one.
+        """
+        return page_level if page_level and page_level > 0 else 0
+
+    @staticmethod
+    def page_anchor(page_level: Union[int, None]) -> int:
+        """Get the keyset anchor stored in a page level.
+
+        Args:
+            page_level: Stored page level, see `Tools.page_offset`.
+
+        Returns:
+            anchor: Identifier of the first item of the page,
+                    0 for the first page.
+        """
+        return -page_level if page_level and page_level < 0 else 0
+
+    @staticmethod
+    def keyset_navigation(
+        header: str,
+        list_of_items: list[Record, ...],
+        has_previous: bool,
+        has_next: bool,
+        key: Optional[str] = None
+    ) -> LayerTemplate:
+        """Create a navigation menu for pages ordered by name.
+
+        Args:
+            header: The section the button belongs to.
+            list_of_items: Items on the current page.
+            has_previous: Whether there are items before the page.
+            has_next: Whether there are items after the page.
+            key: Unique identifier for the collection. Defaults to None.
+
+        Returns:
+            buttons: List of navigation buttons.
+        """
+        buttons = [[]]
+        navigation = []
+        if has_previous:
+            navigation.append(["«", "page_first"])
+            navigation.append(["‹", f"page_before_{list_of_items[0].id}"])
+        if has_next:
+            navigation.append(["›", f"page_after_{list_of_items[-1].id}"])
+            navigation.append(["»", "page_last"])
+
+        for button_name, data in navigation:
+            button_data = f"{header}/{data}"
+            if key:
+                button_data += f"/{key}"
+
+            buttons[0].append([button_name, button_data])
+
+        return buttons
+
 
 class Errors:
     """Error handling class.
@@ -767,8 +1374,7 @@ class Errors:
                     any special preferences that the user wants to see in
                     their user interface.
         """
-        with Select(MESSAGES_DATABASE) as select:
-            text = select.bot_message("empty_collection", locale)
+        text = MessageCatalog.message("empty_collection", locale)
 
         API.answer_callback_query(callback_id, text, True)
 
@@ -791,17 +1397,7 @@ class Errors:
             if is_exists:
                 func(self, *args, **kwargs)
             else:
-                with Select(USERS_DATABASE) as select:
-                    locale = select.user_attribute(self.user_id, "locale")
-
-                with Select(MESSAGES_DATABASE) as select:
-                    title = select.bot_message("does_not_exist", locale)
-
-                API.answer_callback_query(
-                    callback_query_id=self.callback_id,
-                    text=title,
-                    show_alert=True
-                )
+                Errors.does_not_exist(self.user_id, self.callback_id)
         return _collection_existence_check
 
     @staticmethod
@@ -816,29 +1412,33 @@ class Errors:
             - `self.callback_id`
         """
         def _card_and_collection_existence_check(self, *args, **kwargs):
-            card_exists = Tools.check_card_existence(
-                user_id=self.user_id,
-                key=self.key,
-                card_key=self.card_key
-            )
-
-            collection_exists = Tools.check_collection_existence(
-                user_id=self.user_id,
-                key=self.key
-            )
+            with Select(COLLECTIONS_DATABASE) as select:
+                collection_exists, card_exists = select.existence(
+                    self.user_id, self.key, self.card_key
+                )
 
             if collection_exists and card_exists:
-                func(self, *args, **kwargs)
-            else:
-                with Select(USERS_DATABASE) as select:
-                    locale = select.user_attribute(self.user_id, "locale")
+                return func(self, *args, **kwargs)
 
-                with Select(MESSAGES_DATABASE) as select:
-                    title = select.bot_message("does_not_exist", locale)
-
-                API.answer_callback_query(
-                    callback_query_id=self.callback_id,
-                    text=title,
-                    show_alert=True
-                )
+            Errors.does_not_exist(self.user_id, self.callback_id)
+            return None
         return _card_and_collection_existence_check
+
+    @staticmethod
+    def does_not_exist(user_id: int, callback_id: int) -> None:
+        """Tell the user that the collection or card no longer exists.
+
+        Args:
+            user_id: Unique identifier of the target user.
+            callback_id: Unique identifier for the query to be answered.
+        """
+        with Select(USERS_DATABASE) as select:
+            locale = select.user_attribute(user_id, "locale")
+
+        title = MessageCatalog.message("does_not_exist", locale)
+
+        API.answer_callback_query(
+            callback_query_id=callback_id,
+            text=title,
+            show_alert=True
+        )
@@ -0,0 +1,109 @@
+"""
+    Implementation of reading cards from CSV and TSV documents.
+"""
+import io
+import csv
+from typing import IO, Iterator, Optional
+
+from ..config import IMPORT_MAX_CARDS
+
+# Longest card name or description, the limit of a Telegram message.
+MAX_FIELD_LENGTH = 4096
+
+# Description of imported cards that have none.
+EMPTY_DESCRIPTION = "🚫"
+
+
+# pylint: disable=unsubscriptable-object
+class CardReader:
+    """Cards read one at a time from a CSV or TSV document.
+
+    Note:
+        The document is decoded and parsed while it is being iterated,
+        so it is never loaded into memory as a whole. Every row holds
+        the name of a card and, optionally, its description. An optional
+        "name, description" header is ignored. Rows without a name, with
+        a field longer than `MAX_FIELD_LENGTH` or beyond `max_cards` are
+        skipped, and reading stops at the first malformed row.
+
+    Attributes:
+        stream: Binary stream of the document.
+        delimiter: Field delimiter. Defaults to ",".
+        max_cards: Maximum number of cards read from the document.
+    """
+    def __init__(
+        self,
+        stream: IO[bytes],
+        delimiter: Optional[str] = ",",
+        max_cards: Optional[int] = IMPORT_MAX_CARDS
+    ) -> None:
+        self.stream = stream
+        self.delimiter = delimiter
+        self.max_cards = max_cards
+
+        # Counters of the read rows.
+        self.cards = 0
+        self.skipped = 0
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        text = io.TextIOWrapper(
+            self.stream, encoding="utf-8-sig", errors="replace", newline=""
+        )
+        rows = csv.reader(text, delimiter=self.delimiter)
+
+        header = True
+        while True:
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            except csv.Error:
+                self.skipped += 1
+                return
+
+            if not any(field.strip() for field in row):
+                continue
+
+            if header:
+                header = False
+                if CardReader._is_header(row):
+                    continue
+
+            card = CardReader._card(row)
+            if card is None or self.cards >= self.max_cards:
+                self.skipped += 1
+                continue
+
+            self.cards += 1
+            yield card
+
+    @staticmethod
+    def delimiter_of(file_name: str, mime_type: str) -> str:
+        """Define the field delimiter of a document.
+
+        Args:
+            file_name: Original name of the document.
+            mime_type: MIME type of the document.
+
+        Returns:
+            delimiter: Tab for TSV documents, comma otherwise.
+        """
+        if (file_name.lower().endswith(".tsv") or
+                mime_type == "text/tab-separated-values"):
+            return "\t"
+        return ","
+
+    @staticmethod
+    def _is_header(row: list[str]) -> bool:
+        fields = [field.strip().lower() for field in row[:2]]
+        return fields in (["name"], ["name", "description"])
+
+    @staticmethod
+    def _card(row: list[str]) -> Optional[tuple[str, str]]:
+        name = row[0].strip()
+        description = row[1].strip() if len(row) > 1 else ""
+
+        if (not name or len(name) > MAX_FIELD_LENGTH or
+                len(description) > MAX_FIELD_LENGTH):
+            return None
+        return name, description or EMPTY_DESCRIPTION
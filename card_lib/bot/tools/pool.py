@@ -0,0 +1,215 @@
+"""
+    Implementation of a PostgreSQL connection pool.
+"""
+from __future__ import annotations
+import os
+import time
+import threading
+from typing import Optional
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from ..config import POSTGRESQL_DATABASE_URL
+from ..config import DATABASE_POOL_MIN_SIZE, DATABASE_POOL_MAX_SIZE
+from ..config import DATABASE_POOL_MAX_LIFETIME, DATABASE_POOL_TIMEOUT
+from ..config import DATABASE_POOL_HEALTH_CHECK
+
+
+class ConnectionPool:
+    """Thread-safe pool of PostgreSQL connections.
+
+    Note:
+        Every process gets its own pool, created on first use. Gunicorn
+        workers therefore open their connections after the fork and never
+        share sockets with the master or with each other.
+
+    Attributes:
+        dsn: Database connection string.
+        min_size: Number of connections opened when the pool is created.
+        max_size: Maximum number of connections held by the pool.
+        max_lifetime: Seconds after which a connection is replaced.
+        timeout: Seconds to wait for a free connection.
+        health_check: Seconds of idleness after which a connection
+                      is pinged before being handed out.
+    """
+    _instance = None
+    _instance_pid = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: Optional[int] = 1,
+        max_size: Optional[int] = 10,
+        max_lifetime: Optional[int] = 1800,
+        timeout: Optional[float] = 10,
+        health_check: Optional[int] = 30
+    ) -> None:
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check = health_check
+
+        # Idle connections as (connection, last used) pairs, newest last.
+        self._idle = []
+        # Creation time of every open connection, keyed by its id.
+        self._created = {}
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        for _ in range(min(min_size, max_size)):
+            connection = self._connect()
+            self._idle.append((connection, time.monotonic()))
+            self._size += 1
+
+    @classmethod
+    def instance(cls) -> ConnectionPool:
+        """Get the pool of the current process.
+
+        Returns:
+            pool: Connection pool configured from the bot settings.
+        """
+        pid = os.getpid()
+        if cls._instance is None or cls._instance_pid != pid:
+            with cls._instance_lock:
+                if cls._instance is None or cls._instance_pid != pid:
+                    cls._instance = cls(
+                        dsn=POSTGRESQL_DATABASE_URL,
+                        min_size=DATABASE_POOL_MIN_SIZE,
+                        max_size=DATABASE_POOL_MAX_SIZE,
+                        max_lifetime=DATABASE_POOL_MAX_LIFETIME,
+                        timeout=DATABASE_POOL_TIMEOUT,
+                        health_check=DATABASE_POOL_HEALTH_CHECK
+                    )
+                    cls._instance_pid = pid
+        return cls._instance
+
+    def getconn(self) -> extensions.connection:
+        """Borrow a connection from the pool.
+
+        Returns:
+            connection: Healthy database connection.
+
+        Raises:
+            PoolError: No connection became available within `timeout`.
+        """
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError("connection pool exhausted")
+                    self._condition.wait(remaining)
+
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                else:
+                    connection, last_used = None, None
+                    self._size += 1
+
+            if connection is None:
+                break
+
+            if self._is_usable(connection, last_used):
+                return connection
+
+            with self._condition:
+                self._discard(connection)
+                self._condition.notify()
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def putconn(
+        self,
+        connection: extensions.connection,
+        close: Optional[bool] = False
+    ) -> None:
+        """Return a borrowed connection to the pool.
+
+        Args:
+            connection: Connection previously received from `getconn`.
+            close: Close the connection instead of keeping it.
+                   Defaults to False.
+        """
+        if not close and not connection.closed:
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    close = True
+
+        with self._condition:
+            if close or self._closed or self._is_expired(connection):
+                self._discard(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def closeall(self) -> None:
+        """Close every idle connection and refuse further borrowing.
+        """
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                connection, _ = self._idle.pop()
+                self._discard(connection)
+            self._condition.notify_all()
+
+    def _connect(self) -> extensions.connection:
+        connection = psycopg2.connect(self.dsn, sslmode="require")
+        self._created[id(connection)] = time.monotonic()
+        return connection
+
+    def _discard(self, connection: extensions.connection) -> None:
+        self._created.pop(id(connection), None)
+        self._size -= 1
+
+        if not connection.closed:
+            try:
+                connection.close()
+            except psycopg2.Error:
+                pass
+
+    def _is_expired(self, connection: extensions.connection) -> bool:
+        created = self._created.get(id(connection), 0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def _is_usable(
+        self,
+        connection: extensions.connection,
+        last_used: float
+    ) -> bool:
+        if connection.closed or self._is_expired(connection):
+            return False
+
+        if time.monotonic() - last_used < self.health_check:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1;")
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
@@ -0,0 +1,187 @@
+"""
+    Implementation of rate limiting for outbound Telegram API calls.
+"""
+import time
+import threading
+from typing import Any, Hashable, Optional
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens, the allowed burst.
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """Get the time until a token is available.
+
+        Args:
+            now: Current monotonic time.
+
+        Returns:
+            wait: Seconds to wait, 0 if a token is available.
+        """
+        self._refill(now)
+
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens)/self.rate
+
+    def take(self) -> None:
+        """Take one token from the bucket.
+        """
+        self._tokens -= 1
+
+    def block(self, until: float) -> None:
+        """Hand out no tokens until the given time.
+
+        Args:
+            until: Monotonic time the bucket stays empty until.
+        """
+        self._tokens = 0
+        self._blocked_until = max(self._blocked_until, until)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed*self.rate)
+        self._updated = now
+
+
+class RateLimiter:
+    """Global and per-chat token buckets in front of the Telegram API.
+
+    Note:
+        Telegram allows about 30 messages per second overall and about
+        one message per second in a single chat. A call waits until both
+        buckets have a token, or is dropped if that takes longer than
+        `max_wait` seconds.
+
+        The buckets live in the memory of one process. When several
+        processes call Telegram, each of them must be given its share
+        of the global rate. The per-chat limit only holds if every chat
+        is served by a single process, e.g. with shard processes.
+
+    Attributes:
+        rate: Calls per second across all chats.
+        burst: Calls allowed at once across all chats.
+        chat_rate: Calls per second to a single chat.
+        chat_burst: Calls allowed at once to a single chat.
+        max_wait: Seconds a call may wait for a token.
+        max_chats: Number of chats whose buckets are remembered.
+    """
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        chat_rate: float,
+        chat_burst: float,
+        max_wait: float,
+        max_chats: Optional[int] = 10000
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_wait = max_wait
+        self.max_chats = max_chats
+
+        self._global = TokenBucket(rate, burst)
+        self._chats = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters of the limiter activity.
+        self.throttled = 0
+        self.dropped = 0
+        self.retried = 0
+
+    def acquire(self, chat_id: Optional[Hashable] = None) -> bool:
+        """Wait until a call is allowed.
+
+        Args:
+            chat_id: Chat the call is addressed to. Defaults to None,
+                     applying only the global limit.
+
+        Returns:
+            True if the call may be made, False if it has to be dropped.
+        """
+        deadline = time.monotonic() + self.max_wait
+        throttled = False
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                buckets = [self._global]
+                if chat_id is not None:
+                    buckets.append(self._chat_bucket(chat_id))
+
+                wait = max(bucket.wait_time(now) for bucket in buckets)
+                if not wait:
+                    for bucket in buckets:
+                        bucket.take()
+                    return True
+
+                if now + wait > deadline:
+                    self.dropped += 1
+                    return False
+
+                if not throttled:
+                    self.throttled += 1
+                    throttled = True
+
+            time.sleep(wait)
+
+    def retry_after(
+        self,
+        seconds: float,
+        chat_id: Optional[Hashable] = None
+    ) -> None:
+        """Respect the `retry_after` of a 429 response.
+
+        Args:
+            seconds: Seconds Telegram asked to wait.
+            chat_id: Chat the rejected call was addressed to.
+                     Defaults to None, pausing all calls.
+        """
+        with self._lock:
+            until = time.monotonic() + seconds
+            if chat_id is None:
+                self._global.block(until)
+            else:
+                self._chat_bucket(chat_id).block(until)
+            self.retried += 1
+
+    def metrics(self) -> dict[str, Any]:
+        """Get rate limiter metrics.
+
+        Returns:
+            metrics: Counters of throttled, dropped and retried calls.
+        """
+        return {
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "retried": self.retried
+        }
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
@@ -1,10 +1,9 @@
 """
     Implementation of the initial settings of the bot.
 """
-import requests
-
-from .database import Insert, CreateTable
-from ..config import TELEGRAM_TOKEN, TELEGRAM_URL
+from .helpers import API
+from .database import Insert, Update, CreateTable
+from ..config import TELEGRAM_TOKEN
 from ..config import USERS_DATABASE, COLLECTIONS_DATABASE, MESSAGES_DATABASE
 
 
@@ -27,8 +26,52 @@ class SettingsPanel:
         with CreateTable(COLLECTIONS_DATABASE) as create:
             create.bot_cards()
 
+        with CreateTable(USERS_DATABASE) as create:
+            create.bot_updates()
+
+        SettingsPanel.ru_insert_messages()
+        SettingsPanel.en_insert_messages()
+
+    @staticmethod
+    def upgrade_database() -> int:
+        """Bring the schema of an already configured bot up to date.
+
+        Returns:
+            removed: Number of duplicate cards removed before the card
+                     keys were made unique.
+        """
+        with CreateTable(COLLECTIONS_DATABASE) as create:
+            create.collections_indexes()
+            create.cards_indexes()
+            removed = create.user_cards()
+
+        with CreateTable(USERS_DATABASE) as create:
+            create.bot_updates()
+
+        with CreateTable(MESSAGES_DATABASE) as create:
+            create.messages_revision()
+
+        # Missing messages are added and changed texts are updated.
         SettingsPanel.ru_insert_messages()
         SettingsPanel.en_insert_messages()
+        return removed
+
+    @staticmethod
+    def repair_counters() -> int:
+        """Recompute the numbers of collections and cards of all users
+        and the numbers of cards of all collections.
+
+        Note:
+            Repaired users are dropped from the user cache of the current
+            process. Users cached by other running workers keep their old
+            counters until the cache entry expires or the counter changes
+            again, so in "strict" mode the workers should be restarted.
+
+        Returns:
+            repaired: Number of users and collections that were fixed.
+        """
+        with Update(COLLECTIONS_DATABASE) as update:
+            return update.counters()
 
     @staticmethod
     def set_webhook(web: str) -> None:
@@ -37,10 +80,9 @@ class SettingsPanel:
         Args:
             web: The address of the site where the bot is running.
         """
-        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, "setWebhook")
         body = {"url": f"{web}/{TELEGRAM_TOKEN}"}
 
-        requests.post(url, data=body)
+        API.post("setWebhook", body)
 
     @staticmethod
     def delete_webhook(web: str) -> None:
@@ -49,10 +91,9 @@ class SettingsPanel:
         Args:
             web: The address of the site where the bot is running.
         """
-        url = TELEGRAM_URL.format(TELEGRAM_TOKEN, "deleteWebhook")
         body = {"url": f"{web}/{TELEGRAM_TOKEN}"}
 
-        requests.post(url, data=body)
+        API.post("deleteWebhook", body)
 
     @staticmethod
     def en_insert_messages() -> None:
@@ -171,6 +212,20 @@ class SettingsPanel:
             ins.new_bot_message("create_card",
                                 "Enter card name:",
                                 "en")
+            ins.new_bot_message("import_cards", "⇪ Import Cards", "en")
+            ins.new_bot_message("import_cards_info",
+                                "Send a CSV or TSV file with a card on " \
+                                "every line: the name in the first " \
+                                "column and the description in the " \
+                                "second one.",
+                                "en")
+            ins.new_bot_message("cards_imported",
+                                "Cards imported: {}. Rows skipped: {}.",
+                                "en")
+            ins.new_bot_message("import_failed",
+                                "The file could not be read. Please send " \
+                                "a CSV or TSV file of up to 20 MB.",
+                                "en")
             ins.new_bot_message("new_card",
                                 "The new card has been created. " \
                                 "You can already customize it:",
@@ -324,6 +379,21 @@ class SettingsPanel:
             # Card
             ins.new_bot_message("cards", "Карты коллекции «{}»:", "ru")
             ins.new_bot_message("add_card", "+ Добавить карту", "ru")
+            ins.new_bot_message("import_cards", "⇪ Импорт карт", "ru")
+            ins.new_bot_message("import_cards_info",
+                                "Отправьте файл CSV или TSV, в каждой " \
+                                "строке которого одна карта: название " \
+                                "в первом столбце и описание во втором.",
+                                "ru")
+            ins.new_bot_message("cards_imported",
+                                "Импортировано карт: {}. " \
+                                "Пропущено строк: {}.",
+                                "ru")
+            ins.new_bot_message("import_failed",
+                                "Не удалось прочитать файл. Пожалуйста, " \
+                                "отправьте файл CSV или TSV размером " \
+                                "до 20 МБ.",
+                                "ru")
             ins.new_bot_message("create_card",
                                 "Введите название карты:",
                                 "ru")
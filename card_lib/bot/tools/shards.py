@@ -0,0 +1,186 @@
+"""
+    Implementation of a pool of worker processes sharded by key.
+"""
+import os
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+from typing import Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# Processes are started fresh instead of forked from a threaded parent.
+_context = multiprocessing.get_context("spawn")
+
+
+class ShardPool:
+    """Pool of worker processes, each responsible for a fixed set of keys.
+
+    Note:
+        An item always goes to the process `key % processes`, so all work
+        of one key runs in one process, one item at a time and in the
+        order the items were submitted. Every process has its own database
+        pool and caches. The pool has to be used from a single dispatching
+        process, e.g. one web worker or the long-polling runner, which
+        `gunicorn.conf.py` enforces for the web server.
+
+    Attributes:
+        name: Name of the pool, used for the worker processes.
+        handler: Module-level function called for every submitted item.
+        finalizer: Module-level function called by a process when it
+                   is stopped. Defaults to None.
+        processes: Number of worker processes.
+        capacity: Maximum number of waiting items per process.
+        drain_timeout: Seconds to wait for a process to finish on stop.
+    """
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], None],
+        finalizer: Optional[Callable[[], None]] = None,
+        processes: Optional[int] = 2,
+        capacity: Optional[int] = 1000,
+        drain_timeout: Optional[float] = 10
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.finalizer = finalizer
+        self.processes = processes
+        self.capacity = capacity
+        self.drain_timeout = drain_timeout
+
+        self._queues = []
+        self._workers = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Counters of the pool activity.
+        self.submitted = 0
+        self.rejected = 0
+        self.restarted = 0
+
+    def submit(
+        self,
+        key: int,
+        item: Any,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Put an item in the queue of the process responsible for the key.
+
+        Args:
+            key: Items with equal keys are handled in submission order.
+            item: Picklable item passed to the handler.
+            timeout: Seconds to wait for room in the queue.
+                     Defaults to None, waiting as long as needed.
+
+        Returns:
+            True if the item was queued, False otherwise.
+        """
+        self._start()
+        index = (key or 0) % self.processes
+        self._revive(index)
+
+        try:
+            self._queues[index].put(item, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+        self.submitted += 1
+        return True
+
+    def stop(self) -> None:
+        """Handle all queued items and stop the processes.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+
+            for shard_queue in self._queues:
+                shard_queue.put(None)
+            for worker in self._workers:
+                worker.join(self.drain_timeout)
+                if worker.is_alive():
+                    worker.terminate()
+
+            self._queues = []
+            self._workers = []
+            self._pid = None
+
+    def metrics(self) -> dict[str, Any]:
+        """Get pool activity metrics.
+
+        Returns:
+            metrics: Queue depth of every process and item counters.
+        """
+        return {
+            "depth": [shard_queue.qsize() for shard_queue in self._queues],
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "restarted": self.restarted
+        }
+
+    def _start(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+
+            self._queues = [
+                _context.Queue(maxsize=self.capacity)
+                for _ in range(self.processes)
+            ]
+            self._workers = [
+                self._spawn(index) for index in range(self.processes)
+            ]
+
+            if self._pid is None:
+                atexit.register(self.stop)
+            self._pid = pid
+
+    def _revive(self, index: int) -> None:
+        if self._workers[index].is_alive():
+            return
+
+        with self._lock:
+            if not self._workers[index].is_alive():
+                logger.warning("%s-%s died, restarting it", self.name, index)
+                self._workers[index] = self._spawn(index)
+                self.restarted += 1
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        worker = _context.Process(
+            target=_serve,
+            args=(
+                self.name, self.handler, self.finalizer, self._queues[index]
+            ),
+            name=f"{self.name}-{index}",
+            daemon=True
+        )
+        worker.start()
+        return worker
+
+
+def _serve(
+    name: str,
+    handler: Callable[[Any], None],
+    finalizer: Optional[Callable[[], None]],
+    shard_queue: multiprocessing.Queue
+) -> None:
+    while True:
+        item = shard_queue.get()
+        if item is None:
+            break
+
+        try:
+            handler(item)
+        except Exception: # pylint: disable=broad-except
+            logger.exception("%s failed to handle an item", name)
+
+    if finalizer:
+        finalizer()
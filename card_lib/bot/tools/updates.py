@@ -0,0 +1,93 @@
+"""
+    Implementation of the log of handled updates.
+"""
+import threading
+from typing import Union
+from collections import OrderedDict
+
+from .database import Insert, Delete
+from ..config import USERS_DATABASE
+from ..config import UPDATE_LOG_SIZE, UPDATE_LOG_PERSISTENT
+
+# Number of claimed updates between removals of old update identifiers.
+_PRUNE_INTERVAL = 100
+
+
+class UpdateLog:
+    """Identifiers of the updates that were already handled.
+
+    Note:
+        Telegram delivers an update again if the webhook did not answer
+        in time. Every worker remembers the latest `UPDATE_LOG_SIZE`
+        update identifiers it claimed. With `UPDATE_LOG_PERSISTENT` the
+        claim is also written to the database inside the unit of work of
+        the update, so it is undone if handling the update fails.
+    """
+    _claimed = OrderedDict()
+    _lock = threading.Lock()
+
+    # Number of redelivered updates that were dropped.
+    replayed = 0
+
+    @staticmethod
+    def claim(update_id: Union[int, None]) -> bool:
+        """Claim an update in the memory of the worker.
+
+        Args:
+            update_id: Unique identifier of the update.
+
+        Returns:
+            True if the update has to be handled, False if it is a replay.
+        """
+        if update_id is None:
+            return True
+
+        with UpdateLog._lock:
+            if update_id in UpdateLog._claimed:
+                UpdateLog.replayed += 1
+                return False
+
+            UpdateLog._claimed[update_id] = None
+            if len(UpdateLog._claimed) > UPDATE_LOG_SIZE:
+                UpdateLog._claimed.popitem(last=False)
+        return True
+
+    @staticmethod
+    def claim_persisted(update_id: Union[int, None]) -> bool:
+        """Claim an update in the database.
+
+        Note:
+            Must be called inside the unit of work of the update.
+
+        Args:
+            update_id: Unique identifier of the update.
+
+        Returns:
+            True if the update has to be handled, False if it is a replay.
+        """
+        if update_id is None or not UPDATE_LOG_PERSISTENT:
+            return True
+
+        with Insert(USERS_DATABASE) as insert:
+            is_claimed = insert.update_claim(update_id, UPDATE_LOG_SIZE)
+
+        if not is_claimed:
+            with UpdateLog._lock:
+                UpdateLog.replayed += 1
+            return False
+
+        if update_id % _PRUNE_INTERVAL == 0:
+            with Delete(USERS_DATABASE) as delete:
+                delete.old_updates(UPDATE_LOG_SIZE)
+        return True
+
+    @staticmethod
+    def release(update_id: Union[int, None]) -> None:
+        """Forget an update whose handling failed, so that
+        its redelivery is handled again.
+
+        Args:
+            update_id: Unique identifier of the update.
+        """
+        with UpdateLog._lock:
+            UpdateLog._claimed.pop(update_id, None)
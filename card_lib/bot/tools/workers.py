@@ -0,0 +1,161 @@
+"""
+    Implementation of background worker pools.
+"""
+import os
+import queue
+import atexit
+import logging
+import threading
+from typing import Any, Optional, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Item that tells a worker to stop.
+_STOP = object()
+
+
+class KeyedWorkerPool:
+    """Pool of worker threads that keeps the order of related items.
+
+    Note:
+        Items with the same key are always handled by the same worker,
+        and every worker handles its items one at a time, in the order
+        they were submitted. The threads are started on first use in
+        every process and drained when the process exits.
+
+    Attributes:
+        name: Name of the pool, used for the worker threads.
+        handler: Function called for every submitted item.
+        workers: Number of worker threads.
+        capacity: Maximum number of waiting items per worker.
+        drain_timeout: Seconds to wait for the queues to drain on stop.
+    """
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], None],
+        workers: Optional[int] = 4,
+        capacity: Optional[int] = 1000,
+        drain_timeout: Optional[float] = 10
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.capacity = capacity
+        self.drain_timeout = drain_timeout
+
+        self._queues = []
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Counters of the pool activity.
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(
+        self,
+        key: Hashable,
+        item: Any,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """Put an item in the queue of the worker responsible for the key.
+
+        Note:
+            If the queue is full, the caller is blocked until there is
+            room in it or the timeout expires.
+
+        Args:
+            key: Items with equal keys are handled in submission order.
+            item: Item passed to the handler.
+            timeout: Seconds to wait for room in the queue.
+                     Defaults to None, waiting as long as needed.
+
+        Returns:
+            True if the item was queued, False otherwise.
+        """
+        self._start()
+        worker_queue = self._queues[hash(key) % self.workers]
+
+        try:
+            worker_queue.put(item, timeout=timeout)
+        except queue.Full:
+            self.rejected += 1
+            return False
+
+        self.submitted += 1
+        return True
+
+    def stop(self) -> None:
+        """Handle all queued items and stop the workers.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+
+            for worker_queue in self._queues:
+                worker_queue.put(_STOP)
+            for thread in self._threads:
+                thread.join(self.drain_timeout)
+
+            self._queues = []
+            self._threads = []
+            self._pid = None
+
+    def metrics(self) -> dict[str, Any]:
+        """Get pool activity metrics.
+
+        Returns:
+            metrics: Queue depth of every worker and item counters.
+        """
+        return {
+            "depth": [worker_queue.qsize() for worker_queue in self._queues],
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+    def _start(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+
+            self._queues = [
+                queue.Queue(maxsize=self.capacity)
+                for _ in range(self.workers)
+            ]
+            self._threads = [
+                threading.Thread(
+                    target=self._run,
+                    args=(worker_queue,),
+                    name=f"{self.name}-{index}",
+                    daemon=True
+                )
+                for index, worker_queue in enumerate(self._queues)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+            if self._pid is None:
+                atexit.register(self.stop)
+            self._pid = pid
+
+    def _run(self, worker_queue: queue.Queue) -> None:
+        while True:
+            item = worker_queue.get()
+            if item is _STOP:
+                break
+
+            try:
+                self.handler(item)
+                self.completed += 1
+            except Exception: # pylint: disable=broad-except
+                self.failed += 1
+                logger.exception("%s failed to handle an item", self.name)
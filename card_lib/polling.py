@@ -0,0 +1,166 @@
+"""
+    Bot launch module for long polling.
+"""
+import time
+import logging
+from typing import Any, Union, Optional
+
+from .bot.config import USERS_DATABASE, TELEGRAM_READ_TIMEOUT
+from .bot.config import POLLING_TIMEOUT, POLLING_LIMIT
+from .bot.config import UPDATE_WORKERS, SHARD_PROCESSES
+from .bot.tools.helpers import API
+from .bot.tools.cache import UserCache
+from .bot.tools.database import Select, UserState, USER_COLUMNS
+from .bot.tools.handlers import UpdateHandler, UpdateQueue
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before polling again after a failed request.
+RETRY_DELAY = 5
+
+
+# pylint: disable=unsubscriptable-object
+class Poller:
+    """Receiving updates with `getUpdates` long polling.
+
+    Note:
+        Telegram does not return updates while a webhook is set, so it
+        is deleted when polling starts. Updates of a batch are grouped by
+        user, the attributes of all users of the batch are fetched with a
+        single query, and the updates of every user are handled in order.
+        If background workers or shard processes are configured, updates
+        are passed to them instead.
+
+    Attributes:
+        timeout: Seconds a single request waits for new updates.
+        limit: Maximum number of updates in a batch.
+    """
+    def __init__(
+        self,
+        timeout: Optional[int] = POLLING_TIMEOUT,
+        limit: Optional[int] = POLLING_LIMIT
+    ) -> None:
+        self.timeout = timeout
+        self.limit = limit
+
+        # Identifier of the first update that was not handled yet.
+        self.offset = None
+
+    def run(self) -> None:
+        """Receive and handle updates until the process is stopped.
+
+        Note:
+            A batch that fails is logged and skipped, the offset still
+            moves past it, so a broken update is not received again.
+        """
+        response = API.post("deleteWebhook", {})
+        if not response or not response.get("ok"):
+            logger.warning(
+                "Telegram method deleteWebhook failed: %s", response
+            )
+
+        while True:
+            updates = self.fetch()
+
+            if updates is None:
+                time.sleep(RETRY_DELAY)
+            elif updates:
+                self.offset = updates[-1]["update_id"] + 1
+                try:
+                    self.handle(updates)
+                except Exception: # pylint: disable=broad-except
+                    logger.exception(
+                        "Batch of %s updates failed", len(updates)
+                    )
+
+    def fetch(self) -> Union[list[dict[str, Any]], None]:
+        """Receive the next batch of updates.
+
+        Returns:
+            updates: New updates, empty if none arrived within `timeout`,
+                     None if the request failed.
+        """
+        body = {
+            "timeout": self.timeout,
+            "limit": self.limit,
+            "allowed_updates": ["message", "callback_query"]
+        }
+        if self.offset is not None:
+            body["offset"] = self.offset
+
+        response = API.post(
+            "getUpdates",
+            body,
+            read_timeout=self.timeout + TELEGRAM_READ_TIMEOUT
+        )
+        if not response or not response.get("ok"):
+            logger.warning("Telegram method getUpdates failed: %s", response)
+            return None
+        return response["result"]
+
+    def handle(self, updates: list[dict[str, Any]]) -> None:
+        """Handle a batch of updates.
+
+        Args:
+            updates: Updates in the order they were received.
+        """
+        if UPDATE_WORKERS or SHARD_PROCESSES:
+            for update in updates:
+                while not UpdateQueue.enqueue(update):
+                    time.sleep(RETRY_DELAY)
+            return
+
+        batches = {}
+        for update in updates:
+            user_id = UpdateHandler.user_id(update)
+            batches.setdefault(user_id, []).append(update)
+
+        prefetched = Poller.prefetch(
+            [user_id for user_id in batches if user_id is not None]
+        )
+
+        # All handlers are created before any of them runs, so repeated
+        # taps within the batch are coalesced.
+        update_handlers = []
+        for user_id, user_updates in batches.items():
+            user_state = prefetched.get(user_id)
+            for update in user_updates:
+                update_handlers.append(UpdateHandler(
+                    update, {user_id: user_state} if user_state else None
+                ))
+
+        for update_handler in update_handlers:
+            try:
+                update_handler.handler()
+            except Exception: # pylint: disable=broad-except
+                logger.exception(
+                    "Update %s failed", update_handler.update.get("update_id")
+                )
+
+    @staticmethod
+    def prefetch(user_ids: list[int, ...]) -> dict[int, UserState]:
+        """Get the attributes of several users with a single query.
+
+        Args:
+            user_ids: Unique identifiers of the target users.
+
+        Returns:
+            prefetched: Attributes of the registered users,
+                        keyed by user identifier.
+        """
+        if not user_ids:
+            return {}
+
+        with Select(USERS_DATABASE) as select:
+            rows = select.users_rows(user_ids, *USER_COLUMNS)
+
+        prefetched = {user_id: row._asdict() for user_id, row in rows.items()}
+        if UserCache.enabled():
+            for user_id, user_state in prefetched.items():
+                UserCache.put(user_id, user_state)
+        return prefetched
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    Poller().run()
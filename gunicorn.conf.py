@@ -0,0 +1,21 @@
+"""
+    Gunicorn settings of the bot.
+"""
+import os
+
+# Shard processes keep the updates of a user in order only if a single
+# process receives the updates and dispatches them.
+SHARD_PROCESSES = int(os.environ.get("SHARD_PROCESSES", 0))
+
+
+def on_starting(server) -> None:
+    """Refuse to start several web workers with shard processes.
+
+    Args:
+        server: Gunicorn arbiter.
+    """
+    if SHARD_PROCESSES and server.cfg.workers > 1:
+        raise SystemExit(
+            "SHARD_PROCESSES requires a single gunicorn worker, "
+            f"{server.cfg.workers} were configured"
+        )